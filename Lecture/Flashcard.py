@@ -1,6 +1,6 @@
 import json
 import re
-from google.generativeai import GenerativeModel
+from llm import generate_text
 
 def clean_json_response(response_text):
     response_text = response_text.strip()
@@ -48,14 +48,13 @@ Rules:
 """
 
     try:
-        model = GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt)
+        response_text = generate_text(prompt)
 
-        if not response or not response.text:
+        if not response_text:
             print("Error: Empty response from model")
             return []
 
-        cleaned_text = clean_json_response(response.text)
+        cleaned_text = clean_json_response(response_text)
         flashcards = json.loads(cleaned_text)
 
         if isinstance(flashcards, list) and all("front" in fc and "back" in fc for fc in flashcards):
@@ -1,74 +1,194 @@
-from google import genai
-from google.genai import types
+from concurrent.futures import ThreadPoolExecutor
+from cache import CACHE_DIR, DiskCache, cache_key
+from llm import TTS_MODEL_NAME, EmptyAudioResponse, synthesize_speech
+from manifest import LectureManifest
+from ratelimit import TTS_LIMITER, sleep
+from slides import split_slide_markdown
+import random
 import wave
 import re
 import os
 
-def wave_file(filename, pcm, channels=1, rate=24000, sample_width=2):
+# chunk syntheses queued per lecture; enough to fill TTS_LIMITER, which decides how many run
+MAX_TTS_CONCURRENCY = TTS_LIMITER.concurrency.maximum
+TTS_RETRIES = 2           # extra attempts when the model returns no audio
+TTS_RETRY_DELAY = 2.0     # seconds; upper bound of the first jittered back-off, doubled per attempt
+TTS_CHUNK_CHARS = 3000    # sections longer than this are split on sentence boundaries
+CHUNK_GAP_SECONDS = 0.15  # silence inserted between chunks of one section
+SILENT_SLIDE_SECONDS = 3.0  # how long a slide without narration (e.g. the title slide) is held
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+
+_SENTENCE_END = re.compile(r'(?<=[.!?।。！？])\s+')
+
+# ---- AUDIO CACHE: raw PCM keyed by (normalized text, voice, model), LRU within a byte budget ----
+TTS_CACHE_BYTES = int(os.environ.get("COLLEGEAI_TTS_CACHE_BYTES", 1024 * 1024 * 1024))
+_audio_cache = DiskCache(os.path.join(CACHE_DIR, "tts"), max_bytes=TTS_CACHE_BYTES, suffix=".pcm")
+
+def wave_file(filename, pcm, channels=1, rate=SAMPLE_RATE, sample_width=SAMPLE_WIDTH):
     with wave.open(filename, "wb") as wf:
         wf.setnchannels(channels)
         wf.setsampwidth(sample_width)
         wf.setframerate(rate)
         wf.writeframes(pcm)
 
-def generate_tts_per_slide(md_file, voice_name="Kore"):
-    client = genai.Client()
+def parse_script_sections(content, slide_titles=None):
+    """
+    Split a narration script into [(title, text)], one per slide, with the splitter the
+    slides use (slides.split_slide_markdown): entry 0 narrates the title slide and entry i
+    slide i. Sections without narration are kept with empty text, so ids never shift.
+    With `slide_titles`, there is exactly one section per slide, titled like the slide:
+    missing sections get empty narration and surplus ones are merged into the last slide.
+    """
+    sections = split_slide_markdown(content)
+    if slide_titles is None:
+        return sections
+    texts = [text for _, text in sections]
+    if len(texts) > len(slide_titles):
+        texts[len(slide_titles) - 1:] = ["\n\n".join(text for text in texts[len(slide_titles) - 1:] if text)]
+    texts += [""] * (len(slide_titles) - len(texts))
+    return list(zip(slide_titles, texts))
+
+def split_tts_chunks(text, max_chars=TTS_CHUNK_CHARS):
+    """Split narration into pieces of at most `max_chars`, breaking on sentence boundaries."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces = []
+    for sentence in _SENTENCE_END.split(text):
+        # A single over-long sentence falls back to whitespace breaks
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        if sentence:
+            pieces.append(sentence)
+
+    chunks, current = [], ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            chunks.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
+
+def silence(seconds):
+    return b"\0" * (int(SAMPLE_RATE * seconds) * SAMPLE_WIDTH)
+
+def join_pcm(parts, gap_seconds=CHUNK_GAP_SECONDS):
+    """Concatenate PCM chunks in memory with a short silence between them."""
+    return silence(gap_seconds).join(parts)
+
+def synthesize_with_retry(text, voice_name="Kore", retries=TTS_RETRIES, check_cancelled=None):
+    # 429/5xx/timeouts are already retried inside synthesize_speech (the TTS rate limiter);
+    # this only covers responses without audio. 4xx errors and RateLimitTimeout raise at once.
+    for attempt in range(retries + 1):
+        try:
+            return synthesize_speech(text, voice_name=voice_name, check_cancelled=check_cancelled)
+        except EmptyAudioResponse as e:
+            if attempt == retries:
+                raise
+            delay = random.uniform(0, TTS_RETRY_DELAY * 2 ** attempt)  # full jitter
+            print(f"TTS attempt {attempt + 1} failed ({e}), retrying in {delay:.1f}s...")
+            sleep(delay, check_cancelled)
 
+def normalize_tts_text(text):
+    # Whitespace-only edits do not change the spoken audio, so they must not change the key
+    return " ".join(text.split())
+
+def tts_cache_key(text, voice_name, model_name=TTS_MODEL_NAME):
+    return cache_key(normalize_tts_text(text), voice_name, model_name)
+
+def cached_synthesize(text, voice_name="Kore", retries=TTS_RETRIES, check_cancelled=None):
+    """Return PCM for `text`, synthesizing only on a cache miss."""
+    key = tts_cache_key(text, voice_name)
+    pcm = _audio_cache.get(key)
+    if pcm is None:
+        pcm = synthesize_with_retry(text, voice_name=voice_name, retries=retries, check_cancelled=check_cancelled)
+        _audio_cache.put(key, pcm)
+    return pcm
+
+def tts_cache_stats():
+    """Hit/miss counters and current size of the audio cache."""
+    return _audio_cache.stats()
+
+def synthesize_script_audio(content, voice_name="Kore", max_concurrency=MAX_TTS_CONCURRENCY, retries=TTS_RETRIES,
+                            max_chars=TTS_CHUNK_CHARS, on_section=None, check_cancelled=None, slide_titles=None):
+    """
+    Synthesize every section of a narration script in memory. Long sections are split
+    into sentence-aligned chunks; all chunks of all sections run concurrently (at most
+    `max_concurrency` in flight). Returns one dict per section, in order:
+    {"title", "text", "pcm", "samples", "duration"} with 24 kHz mono 16-bit PCM.
+    Section i belongs to slide i (see parse_script_sections; `slide_titles` pins one
+    section per slide), and a section without narration is SILENT_SLIDE_SECONDS of silence.
+    `on_section(idx, section)` is called as each section completes, in order.
+    `check_cancelled()` is polled before and while each chunk waits for the rate limiter;
+    once it raises, queued chunks are dropped and the error propagates.
+    """
+    cleaned_sections = parse_script_sections(content, slide_titles)
+    section_chunks = [split_tts_chunks(text, max_chars) if text.strip() else [] for _, text in cleaned_sections]
+
+    audio_sections = []
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = []
+        for idx, (section_title, _) in enumerate(cleaned_sections):
+            chunks = section_chunks[idx]
+            if chunks:
+                print(f"Generating TTS for Slide {idx+1}: {section_title} ({len(chunks)} chunk(s))")
+            else:
+                print(f"Slide {idx+1}: {section_title} has no narration, holding it {SILENT_SLIDE_SECONDS:.0f}s")
+            futures.append([pool.submit(cached_synthesize, chunk, voice_name, retries, check_cancelled)
+                            for chunk in chunks])
+
+        try:
+            for idx, chunk_futures in enumerate(futures):
+                pcm = (join_pcm([future.result() for future in chunk_futures]) if chunk_futures
+                       else silence(SILENT_SLIDE_SECONDS))
+                section_title, section_text = cleaned_sections[idx]
+                audio_sections.append(audio_section(section_title, pcm, section_text))
+                if on_section is not None:
+                    on_section(idx, audio_sections[-1])
+        except BaseException:
+            # A failed or stopped lecture does not start the chunks still queued
+            for chunk_futures in futures:
+                for future in chunk_futures:
+                    future.cancel()
+            raise
+    stats = tts_cache_stats()
+    print(f"TTS cache: {stats['hits']} hits, {stats['misses']} misses, {stats['bytes'] / 1e6:.1f} MB")
+    return audio_sections
+
+def audio_section(title, pcm, text=""):
+    samples = len(pcm) // SAMPLE_WIDTH
+    return {"title": title, "text": text, "pcm": pcm, "samples": samples, "duration": samples / SAMPLE_RATE}
+
+def generate_tts_per_slide(md_file, voice_name="Kore", max_concurrency=MAX_TTS_CONCURRENCY, retries=TTS_RETRIES,
+                           max_chars=TTS_CHUNK_CHARS, output_folder="."):
+    """
+    Synthesize a script file and save each section as output_folder/slide_N.wav, recording
+    it (title, path, sample count) in the folder's manifest. Returns the paths.
+    """
     with open(md_file, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    # Split at each slide marker (## )
-    sections = re.split(r'\n## ', content)
-
-    # Preprocess to ensure the first section has a clean title
-    cleaned_sections = []
-    for idx, section in enumerate(sections):
-        lines = section.strip().split('\n')
-        if idx == 0:
-            # Try to extract title or fallback
-            title_match = re.match(r'# Title: (.+)', lines[0])
-            section_title = title_match.group(1) if title_match else "Introduction"
-            section_text = '\n'.join(lines[1:]).strip()
-        else:
-            section_title = lines[0].strip()
-            section_text = '\n'.join(lines[1:]).strip()
-        
-        # Remove empty sections
-        if section_text:
-            cleaned_sections.append((section_title, section_text))
-
-    for idx, (section_title, section_text) in enumerate(cleaned_sections):
-        print(f"Generating TTS for Slide {idx+1}: {section_title}")
-
-        # Truncate to 6000 chars if needed
-        if len(section_text) > 6000:
-            section_text = section_text[:6000]
-            print(f"Note: Truncated Slide {idx+1} text to 6000 characters.")
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash-preview-tts",
-            contents=section_text,
-            config=types.GenerateContentConfig(
-                response_modalities=["AUDIO"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                            voice_name=voice_name,
-                        )
-                    )
-                ),
-            )
-        )
-
-        data = response.candidates[0].content.parts[0].inline_data.data
-
-        output_file = f"slide_{idx+1}.wav"
-        wave_file(output_file, data)
-        print(f"✅ Saved: {output_file} for Slide {idx+1}: {section_title}")
+    os.makedirs(output_folder, exist_ok=True)
+    manifest = LectureManifest.open(output_folder, sample_rate=SAMPLE_RATE)
+    output_files = []
+    with manifest.batch():
+        for idx, section in enumerate(synthesize_script_audio(content, voice_name, max_concurrency, retries, max_chars)):
+            output_file = os.path.join(output_folder, f"slide_{idx+1}.wav")
+            wave_file(output_file, section["pcm"])
+            manifest.set_audio(idx + 1, output_file, section["samples"], title=section["title"])
+            output_files.append(output_file)
+            print(f"✅ Saved: {output_file} for Slide {idx+1}: {section['title']}")
+    return output_files
 
 if __name__ == "__main__":
     print("=== Gemini Advanced TTS Per Slide Generator ===")
     md_file = input("Enter the path to your markdown lecture file: ").strip()
     print("Available voices: Kore, Puck, Leda, Zephyr, Charon, Fenrir, Aoede, etc.")
     voice = input("Enter voice name (default 'Kore'): ").strip() or "Kore"
-    generate_tts_per_slide(md_file, voice_name=voice)
+    generate_tts_per_slide(md_file, voice_name=voice, output_folder=os.path.dirname(md_file) or ".")
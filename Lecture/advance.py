@@ -1,59 +1,419 @@
+import hashlib
 import os
-from moviepy import ImageClip, concatenate_videoclips, AudioFileClip
-from pydub import AudioSegment
+import shutil
+import subprocess
+import tempfile
+import threading
 import wave
+from concurrent.futures import ThreadPoolExecutor
+from cache import CACHE_DIR, DiskCache, cache_key, link_file
+from manifest import MANIFEST_FILE, LectureManifest
+from render import VIDEO_SIZE
+from TTS import SAMPLE_RATE, SAMPLE_WIDTH, audio_section
 
-def get_wav_duration(file_path):
-    with wave.open(file_path, 'rb') as wf:
-        frames = wf.getnframes()
-        rate = wf.getframerate()
-        duration = frames / float(rate)
-    return duration
+# ---- ENCODER SETTINGS (still slides: low frame rate, x264 tuned for still images) ----
+VIDEO_FPS = 5
+# Longest HLS preview segment, fixed for the whole playlist (RFC 8216 forbids changing
+# EXT-X-TARGETDURATION). Keyframes are forced on that grid so slides can be cut to it.
+HLS_TARGET_DURATION = int(os.environ.get("COLLEGEAI_HLS_TARGET_DURATION", 10))
+VIDEO_CODEC_ARGS = ["-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage", "-crf", "23",
+                    "-force_key_frames", f"expr:gte(t,n_forced*{HLS_TARGET_DURATION})",
+                    "-pix_fmt", "yuv420p", "-r", str(VIDEO_FPS)]
+AUDIO_CODEC_ARGS = ["-c:a", "aac", "-b:a", "128k", "-ar", "48000", "-ac", "1"]
 
-def generate_advanced_synced_video(slide_images, slide_audio_files, output_file):
-    clips = []
+# ---- SEGMENT ENCODING (one ffmpeg process per slide, joined by stream copy) ----
+MAX_PARALLEL_SEGMENTS = os.cpu_count() or 1
+SEGMENT_CACHE_BYTES = int(os.environ.get("COLLEGEAI_SEGMENT_CACHE_BYTES", 2 * 1024 * 1024 * 1024))
+_segment_cache = DiskCache(os.path.join(CACHE_DIR, "segments"), max_bytes=SEGMENT_CACHE_BYTES, suffix=".mp4")
 
-    for img_path, audio_path in zip(slide_images, slide_audio_files):
-        duration = get_wav_duration(audio_path)
-        print(f"Slide: {img_path}, Duration: {duration:.2f} sec")
+def find_ffmpeg():
+    """$COLLEGEAI_FFMPEG, then ffmpeg on PATH, then the binary bundled with imageio-ffmpeg (a moviepy dependency)."""
+    configured = os.environ.get("COLLEGEAI_FFMPEG")
+    if configured:
+        return configured
+    found = shutil.which("ffmpeg")
+    if found:
+        return found
+    import imageio_ffmpeg
+    return imageio_ffmpeg.get_ffmpeg_exe()
 
-        clip = ImageClip(img_path).with_duration(duration)
-        clips.append(clip)
+def _scale_filter(size=VIDEO_SIZE):
+    width, height = size
+    return (f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,format=yuv420p")
 
-    video = concatenate_videoclips(clips, method="compose")
+def _concat_path(path):
+    return "file '" + os.path.abspath(path).replace("'", "'\\''") + "'"
 
-    # Combine all audio files into one track
-    combined_audio = AudioSegment.empty()
-    for audio_file in slide_audio_files:
-        segment = AudioSegment.from_wav(audio_file)
-        combined_audio += segment
+def write_concat_list(list_file, slide_images, durations):
+    """ffconcat script showing each still for its duration."""
+    lines = ["ffconcat version 1.0"]
+    for img_path, duration in zip(slide_images, durations):
+        lines.append(_concat_path(img_path))
+        lines.append(f"duration {duration:.3f}")
+    # The demuxer ignores the last duration unless the last image is listed once more
+    lines.append(_concat_path(slide_images[len(durations) - 1]))
+    with open(list_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    return list_file
 
-    combined_audio.export("combined_audio.wav", format="wav")
-    audio_clip = AudioFileClip("combined_audio.wav")
-    video = video.with_audio(audio_clip)
+def pad_to_frame(pcm):
+    """
+    Pad PCM with silence to a whole number of video frames so each segment's audio and
+    video end together and stream-copied segments stay in sync.
+    """
+    frame_bytes = SAMPLE_RATE // VIDEO_FPS * SAMPLE_WIDTH
+    remainder = len(pcm) % frame_bytes
+    return pcm + b"\0" * (frame_bytes - remainder) if remainder or not pcm else pcm
 
-    video.write_videofile(output_file, fps=1)
+def segment_duration(samples):
+    """Duration of a slide's segment once its audio is padded to whole frames."""
+    frame_samples = SAMPLE_RATE // VIDEO_FPS
+    return max(1, -(-samples // frame_samples)) * frame_samples / SAMPLE_RATE
+
+def segment_key(img_path, pcm, size=VIDEO_SIZE):
+    # Content-addressed: same frame + same audio + same encoder settings = same segment
+    with open(img_path, "rb") as f:
+        image_hash = hashlib.sha256(f.read()).hexdigest()
+    return cache_key(image_hash, hashlib.sha256(pcm).hexdigest(), size,
+                     VIDEO_FPS, VIDEO_CODEC_ARGS, AUDIO_CODEC_ARGS)
+
+def encode_segment(img_path, pcm, segment_file, size=VIDEO_SIZE):
+    """Encode one still + its narration into a standalone MP4 with the shared codec parameters."""
+    pcm = pad_to_frame(pcm)
+    duration = len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+    cmd = [
+        find_ffmpeg(), "-y", "-loglevel", "error",
+        "-loop", "1", "-framerate", str(VIDEO_FPS), "-i", img_path,
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+        "-vf", _scale_filter(size), *VIDEO_CODEC_ARGS, "-threads", "1", *AUDIO_CODEC_ARGS,
+        "-t", f"{duration:.3f}", "-f", "mp4", segment_file,
+    ]
+    result = subprocess.run(cmd, input=pcm, capture_output=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed on {img_path}: {result.stderr.decode(errors='replace').strip()}")
+    return segment_file
+
+def get_segment(img_path, pcm, reuse=True, dest=None):
+    """
+    Return an encoded segment for (frame, audio), reusing a cached one when unchanged.
+    The segment cache is shared and size-capped, so callers that read the segment later
+    pass `dest`: the segment is hard-linked (or copied) there and `dest` is returned.
+    """
+    key = segment_key(img_path, pcm)
+    if reuse:
+        cached = _segment_cache.file_path(key) if dest is None else _segment_cache.link(key, dest)
+        if cached:
+            return cached
+    fd, tmp_file = tempfile.mkstemp(suffix=".mp4", dir=os.path.dirname(img_path) or ".")
+    os.close(fd)
+    try:
+        encode_segment(img_path, pcm, tmp_file)
+        if dest is not None:
+            link_file(tmp_file, dest)
+        path = _segment_cache.put_file(key, tmp_file)
+        return dest or path
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def concat_segments(segment_files, output_file):
+    """Join segments with the concat demuxer and stream copy (no re-encode)."""
+    list_file = os.path.splitext(output_file)[0] + ".segments.ffconcat"
+    with open(list_file, "w", encoding="utf-8") as f:
+        f.write("ffconcat version 1.0\n" + "".join(_concat_path(path) + "\n" for path in segment_files))
+    try:
+        result = subprocess.run(
+            [find_ffmpeg(), "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", list_file,
+             "-c", "copy", "-movflags", "+faststart", output_file],
+            capture_output=True,
+        )
+    finally:
+        os.remove(list_file)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg concat failed: {result.stderr.decode(errors='replace').strip()}")
+    return output_file
+
+# ---- PROGRESSIVE HLS PREVIEW ----
+HLS_PLAYLIST = "index.m3u8"
+
+def remux_to_ts(segment_file, ts_prefix, duration, offset=0.0, max_duration=HLS_TARGET_DURATION):
+    """
+    Stream-copy an MP4 segment into MPEG-TS pieces of at most `max_duration` seconds
+    (cut on the forced keyframes), shifted to `offset` seconds on the lecture timeline.
+    Returns [(ts_file, duration)] in order; files are named `<ts_prefix>_<n>.ts`.
+    """
+    cuts = [str(t) for t in range(max_duration, int(-(-duration // 1)), max_duration) if t < duration]
+    list_file = ts_prefix + ".csv"
+    cmd = [find_ffmpeg(), "-y", "-loglevel", "error", "-i", segment_file, "-c", "copy",
+           "-bsf:v", "h264_mp4toannexb", "-output_ts_offset", f"{offset:.3f}", "-muxdelay", "0",
+           "-f", "segment", "-segment_format", "mpegts", "-segment_list", list_file, "-segment_list_type", "csv"]
+    if cuts:
+        cmd += ["-segment_times", ",".join(cuts)]
+    result = subprocess.run(cmd + [ts_prefix + "_%d.ts"], capture_output=True)
+    try:
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg remux failed: {result.stderr.decode(errors='replace').strip()}")
+        with open(list_file, encoding="utf-8") as f:
+            rows = [line.strip().rsplit(",", 2) for line in f if line.strip()]
+    finally:
+        if os.path.exists(list_file):
+            os.remove(list_file)
+    # The list's end times are on the shifted timeline; the last piece ends with the slide
+    ends = [float(end) - offset for _, _, end in rows[:-1]] + [duration]
+    starts = [0.0] + ends[:-1]
+    directory = os.path.dirname(ts_prefix)
+    return [(os.path.join(directory, name), end - start) for (name, _, _), start, end in zip(rows, starts, ends)]
+
+class HLSWriter:
+    """
+    Progressive lecture output: slides are added as soon as their frame and audio
+    exist, encoded in parallel, and appended in slide order to an EVENT playlist, so a
+    player can start on the first slides while later ones are still being made.
+    Frames and audio may also arrive separately (`add_frame` / `add_audio`, from
+    different threads); a slide is queued once both halves are there.
+    Slides longer than HLS_TARGET_DURATION are published as several pieces.
+    `on_publish(count)` is called whenever the playlist grows.
+    `finish()` closes the playlist and returns the MP4 segments for the final concat.
+    """
+
+    def __init__(self, output_dir, max_workers=MAX_PARALLEL_SEGMENTS, reuse_segments=True, on_publish=None):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.playlist = os.path.join(output_dir, HLS_PLAYLIST)
+        self.reuse_segments = reuse_segments
+        self.on_publish = on_publish
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        self._lock = threading.RLock()
+        self._futures = {}
+        self._ready = {}
+        self._entries = []
+        self._offset = 0.0
+        self._frames = {}
+        self._audio = {}
+        self._publishing = False
+        self._closed = False
+        self._write_playlist()
+
+    def add(self, idx, img_path, audio):
+        """Queue slide `idx` (0-based). Returns a Future resolving to its encoded MP4 segment."""
+        with self._lock:
+            # Audio is loaded on the encoder thread, so queuing is cheap enough to do under the lock
+            future = self._pool.submit(self._encode, idx, img_path, audio)
+            self._futures[idx] = future
+        return future
+
+    def add_frame(self, idx, img_path):
+        """Frame half of slide `idx`; the slide is queued once its audio is also there."""
+        with self._lock:
+            self._frames[idx] = img_path
+            self._pair(idx)
+
+    def add_audio(self, idx, audio):
+        """Audio half of slide `idx`; the slide is queued once its frame is also there."""
+        with self._lock:
+            self._audio[idx] = audio
+            self._pair(idx)
+
+    def _pair(self, idx):
+        # Called with the lock held: the check and the queuing happen atomically
+        if idx not in self._futures and idx in self._frames and idx in self._audio:
+            self.add(idx, self._frames[idx], self._audio[idx])
+
+    def _encode(self, idx, img_path, audio):
+        pcm = load_audio_section(audio)["pcm"]
+        # Linked into the preview folder, so other jobs' segment-cache eviction cannot remove it
+        segment_file = get_segment(img_path, pcm, reuse=self.reuse_segments,
+                                   dest=os.path.join(self.output_dir, f"segment_{idx+1}.mp4"))
+        with self._lock:
+            self._ready[idx] = (segment_file, segment_duration(len(pcm) // SAMPLE_WIDTH))
+            if self._publishing:
+                return segment_file  # the thread already publishing will pick this slide up
+            self._publishing = True
+        self._publish()
+        return segment_file
+
+    def _publish(self):
+        # Only a contiguous prefix can be published; later slides wait for earlier ones.
+        # One thread publishes at a time and the remux runs outside the lock.
+        while True:
+            with self._lock:
+                seq = len(self._entries)
+                if self._closed or seq not in self._ready:
+                    # Released in the same critical section as the check, so no ready slide is missed
+                    self._publishing = False
+                    return
+                ready_file, ready_duration = self._ready.pop(seq)
+                offset = self._offset
+            try:
+                pieces = remux_to_ts(ready_file, os.path.join(self.output_dir, f"segment_{seq+1}"),
+                                     ready_duration, offset)
+            except Exception:
+                with self._lock:
+                    self._publishing = False
+                raise
+            pieces = [(os.path.basename(ts_file), duration) for ts_file, duration in pieces]
+            with self._lock:
+                self._entries.append((pieces, ready_duration, ready_file))
+                self._offset += ready_duration
+                self._write_playlist()
+                published = len(self._entries)
+            if self.on_publish is not None:
+                self.on_publish(published)
+
+    def _write_playlist(self):
+        lines = [
+            "#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-PLAYLIST-TYPE:EVENT",
+            f"#EXT-X-TARGETDURATION:{HLS_TARGET_DURATION}", "#EXT-X-MEDIA-SEQUENCE:0",
+        ]
+        for pieces, _, _ in self._entries:
+            for name, duration in pieces:
+                lines += [f"#EXTINF:{duration:.3f},", name]
+        if self._closed:
+            lines.append("#EXT-X-ENDLIST")
+        tmp_file = self.playlist + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_file, self.playlist)  # players never see a half-written playlist
+
+    def published(self):
+        """Number of slides currently playable and their total duration in seconds."""
+        with self._lock:
+            return len(self._entries), self._offset
+
+    def close(self):
+        """
+        Drop queued encodes and end the playlist with what is already published
+        (e.g. when the pipeline failed), so players stop polling.
+        """
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._write_playlist()
+
+    def finish(self, check_cancelled=None):
+        """
+        Wait for every queued slide, close the playlist and return the MP4 segments in order.
+        `check_cancelled()` is called between slides and raises to stop waiting.
+        """
+        with self._lock:
+            futures = [self._futures[idx] for idx in sorted(self._futures)]
+        for future in futures:
+            if check_cancelled is not None:
+                check_cancelled()
+            future.result()
+        self._pool.shutdown()
+        with self._lock:
+            self._closed = True
+            self._write_playlist()
+            return [segment_file for _, _, segment_file in self._entries]
+
+
+def load_audio_section(audio):
+    """
+    Accept an in-memory section from TTS.synthesize_script_audio (returned as-is),
+    a section whose "pcm" is a saved .pcm path (as in pipeline audio checkpoints),
+    a raw .pcm path (24 kHz mono 16-bit) or a WAV path (read once, no second decode)
+    and return {"pcm", "samples", "duration"}.
+    """
+    if isinstance(audio, dict):
+        if isinstance(audio["pcm"], (bytes, bytearray)):
+            return audio
+        audio = audio["pcm"]
+    if audio.endswith(".pcm"):
+        with open(audio, "rb") as f:
+            return audio_section(os.path.basename(audio), f.read())
+    with wave.open(audio, 'rb') as wf:
+        if wf.getframerate() != SAMPLE_RATE or wf.getsampwidth() != SAMPLE_WIDTH or wf.getnchannels() != 1:
+            raise ValueError(f"{audio}: expected {SAMPLE_RATE} Hz mono 16-bit audio")
+        pcm = wf.readframes(wf.getnframes())
+    return audio_section(os.path.basename(audio), pcm)
+
+def generate_advanced_synced_video(slide_images, slide_audio_files, output_file, parallel=True,
+                                   max_workers=MAX_PARALLEL_SEGMENTS, reuse_segments=True, check_cancelled=None):
+    """
+    Build the lecture MP4. By default every slide (frame + narration) is encoded as its
+    own segment in parallel, unchanged segments come from the segment cache, and the
+    segments are joined by stream copy. `parallel=False` uses one single-pass encode.
+    `check_cancelled()` is called before each segment and raises to stop the build.
+    """
+    audio_sections = [load_audio_section(audio) for audio in slide_audio_files]
+    count = min(len(slide_images), len(audio_sections))
+    if count == 0:
+        raise ValueError("No slides with audio to assemble")
+    slide_images, audio_sections = slide_images[:count], audio_sections[:count]
+
+    # Durations come straight from the PCM sample counts, no re-probing of files
+    for img_path, audio in zip(slide_images, audio_sections):
+        print(f"Slide: {img_path}, Duration: {audio['duration']:.2f} sec")
+
+    if not parallel:
+        _encode_single_pass(slide_images, audio_sections, output_file)
+    else:
+        # Segments are linked into a private folder so other jobs' cache eviction cannot remove them mid-concat
+        segment_dir = tempfile.mkdtemp(prefix=".segments_", dir=os.path.dirname(output_file) or ".")
+        try:
+            def segment(idx):
+                if check_cancelled is not None:
+                    check_cancelled()
+                return get_segment(slide_images[idx], audio_sections[idx]["pcm"], reuse=reuse_segments,
+                                   dest=os.path.join(segment_dir, f"segment_{idx+1}.mp4"))
+
+            with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+                # Each job drives its own ffmpeg process, so encodes spread across cores
+                segment_files = list(pool.map(segment, range(count)))
+            concat_segments(segment_files, output_file)
+        finally:
+            shutil.rmtree(segment_dir, ignore_errors=True)
     print(f"✅ Lecture video saved as {output_file}")
+    return output_file
+
+def _encode_single_pass(slide_images, audio_sections, output_file):
+    """
+    Single ffmpeg pass: stills via the concat demuxer with per-slide durations, the
+    narration PCM piped on stdin, x264 (stillimage) + AAC muxed straight to MP4.
+    """
+    durations = [audio["duration"] for audio in audio_sections]
+    list_file = os.path.splitext(output_file)[0] + ".ffconcat"
+    write_concat_list(list_file, slide_images, durations)
+    cmd = [
+        find_ffmpeg(), "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_file,
+        "-f", "s16le", "-ar", str(SAMPLE_RATE), "-ac", "1", "-i", "pipe:0",
+        "-vf", _scale_filter(), *VIDEO_CODEC_ARGS, *AUDIO_CODEC_ARGS,
+        "-shortest", "-movflags", "+faststart", output_file,
+    ]
+    try:
+        result = subprocess.run(cmd, input=b"".join(audio["pcm"] for audio in audio_sections),
+                                capture_output=True)
+    finally:
+        os.remove(list_file)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='replace').strip()}")
+    return output_file
 
 def main():
     print("=== Advanced Synced Lecture Video Generator ===")
 
-    slides_folder = input("Enter path to folder containing slide images: ").strip()
-    slide_images = sorted(
-        [os.path.join(slides_folder, f) for f in os.listdir(slides_folder) if f.endswith(".png")]
-    )
-
-    slide_audio_files = sorted(
-        [f for f in os.listdir(".") if f.startswith("slide_") and f.endswith(".wav")]
-    )
+    lecture_folder = input("Enter path to the lecture folder (containing manifest.json): ").strip() or "."
+    try:
+        manifest = LectureManifest.load(lecture_folder)
+    except FileNotFoundError:
+        print(f"❌ No {MANIFEST_FILE} in {lecture_folder}. Render frames and generate TTS into this folder first.")
+        return
 
-    if len(slide_images) != len(slide_audio_files):
-        print(f"❌ Mismatch: {len(slide_images)} slides but {len(slide_audio_files)} audio files.")
+    # Frames and audio are paired by section id, never by file-name sort order
+    sections = manifest.complete_sections()
+    incomplete = [section["id"] for section in manifest.sections() if not (section["frame"] and section["audio"])]
+    if incomplete:
+        print(f"❌ Sections {incomplete} are missing a frame or audio.")
         print("Ensure the number of slides and audio segments match.")
         return
 
-    output_file = "Lecture_Advanced_Synced.mp4"
-    generate_advanced_synced_video(slide_images, slide_audio_files, output_file)
+    output_file = os.path.join(lecture_folder, "Lecture_Advanced_Synced.mp4")
+    generate_advanced_synced_video([section["frame"] for section in sections],
+                                   [section["audio"] for section in sections], output_file)
 
 if __name__ == "__main__":
     main()
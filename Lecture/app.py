@@ -3,23 +3,24 @@ import os
 import json
 import time
 from datetime import datetime
-from extractor import extract_pdf_text, extract_youtube_transcript, summarize_text
-from script import generate_slide_content, generate_professor_script ,generate_notes_gemini
-from slides import generate_slides_from_markdown
-from TTS import generate_tts_per_slide
-from advance import generate_advanced_synced_video
-from video import convert_pptx_to_pdf, convert_pdf_to_images
+import streamlit.components.v1 as components
+from library import SourceLibrary
+from script import generate_notes_gemini
+from advance import HLS_PLAYLIST
+from jobs import get_job_manager
+from pipeline import STAGE_LABELS, STATIC_DIR, start_lecture_job
+from workspace import Workspace, sanitize_filename
 from quiz import generate_quiz , export_quiz_to_pdf , export_quiz_to_moodle_xml , export_quiz_to_json
 from Flashcard import generate_flashcards
 from fpdf import FPDF
 import pypandoc
 
 def configure_gemini():
-    import google.generativeai as genai
+    import llm
     if "GOOGLE_API_KEY" not in st.session_state:
         st.error("❌ Google API Key is missing. Please go to Home and enter it.")
         st.stop()
-    genai.configure(api_key=st.session_state["GOOGLE_API_KEY"])
+    llm.configure(st.session_state["GOOGLE_API_KEY"])
 
 
 st.set_page_config(
@@ -29,6 +30,50 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# hls.js for browsers without native HLS, loaded from the public CDN unless COLLEGEAI_HLS_JS_URL names
+# another URL. A copy at static/vendor/hls.min.js is inlined into the player instead (no third-party
+# request): Streamlit static serving sends .js as text/plain with nosniff, so browsers won't run it by URL.
+HLS_JS_FILE = os.path.join(STATIC_DIR, "vendor", "hls.min.js")
+HLS_JS_CDN_URL = "https://cdn.jsdelivr.net/npm/hls.js@1/dist/hls.min.js"
+
+def static_url(path):
+    """URL under which Streamlit static serving exposes a file inside STATIC_DIR."""
+    base_path = st.get_option("server.baseUrlPath").strip("/")
+    relative = os.path.relpath(path, STATIC_DIR).replace(os.sep, "/")
+    return "/" + "/".join(part for part in (base_path, "app/static", relative) if part)
+
+@st.cache_resource
+def _vendored_hls_js():
+    with open(HLS_JS_FILE, encoding="utf-8") as f:
+        # A literal "</script" would end the inline <script> element early
+        return f.read().replace("</script", "<\\/script")
+
+def hls_js_tag():
+    configured = os.environ.get("COLLEGEAI_HLS_JS_URL")
+    if configured:
+        return f'<script src="{configured}"></script>'
+    if os.path.exists(HLS_JS_FILE):
+        return f"<script>{_vendored_hls_js()}</script>"
+    return f'<script src="{HLS_JS_CDN_URL}"></script>'
+
+def hls_player(output_dir, height=420):
+    """Embed a player for a growing HLS playlist (native HLS on Safari, hls.js elsewhere)."""
+    url = static_url(os.path.join(output_dir, HLS_PLAYLIST))
+    components.html(f"""
+        <video id="lecture" controls autoplay muted playsinline style="width:100%;max-height:{height - 20}px"></video>
+        {hls_js_tag()}
+        <script>
+          const video = document.getElementById("lecture");
+          if (video.canPlayType("application/vnd.apple.mpegurl")) {{
+            video.src = "{url}";
+          }} else if (window.Hls && Hls.isSupported()) {{
+            const hls = new Hls({{liveDurationInfinity: false}});
+            hls.loadSource("{url}");
+            hls.attachMedia(video);
+          }}
+        </script>
+    """, height=height)
+
 # Export Functions (Enhanced with error handling)
 
 def get_timer_seconds(time_limit):
@@ -41,6 +86,69 @@ def get_timer_seconds(time_limit):
         return 120
     return 60  # default
 
+# Shared source library (one ingestion per session, reused by every page)
+
+def get_source_library():
+    if "source_library" not in st.session_state:
+        st.session_state["source_library"] = SourceLibrary()
+    return st.session_state["source_library"]
+
+def select_context(topic, key, extra_sources=(), horizontal=True):
+    """
+    Shared context picker for every page: ingest a YouTube video or PDF into the
+    session's source library, or pick a source ingested earlier on any page.
+    Returns (input_source, context).
+    """
+    library = get_source_library()
+    options = ["None", "Saved Sources", "YouTube Video", "PDF Notes", *extra_sources]
+    input_source = st.radio("Choose context source", options, horizontal=horizontal, key=f"{key}_source")
+    context = ""
+
+    def summarize(source_id):
+        # Stream the summary while it is generated; cached summaries return immediately
+        preview = st.empty()
+        summary = library.context(source_id, topic, on_progress=preview.markdown)
+        preview.empty()
+        return summary
+
+    if input_source == "YouTube Video":
+        url = st.text_input("🎥 YouTube URL", placeholder="https://www.youtube.com/watch?v=...", key=f"{key}_youtube")
+        if url:
+            with st.spinner("🔄 Extracting and summarizing transcript..."):
+                try:
+                    context = summarize(library.add_youtube(url))
+                    st.success("✅ Transcript processed successfully!")
+                except Exception as e:
+                    st.error(f"❌ Error processing YouTube URL: {str(e)}")
+
+    elif input_source == "PDF Notes":
+        pdf_file = st.file_uploader("📄 Upload PDF Notes", type=["pdf"], help="Upload your study materials", key=f"{key}_pdf")
+        if pdf_file:
+            with st.spinner("📖 Extracting and summarizing PDF content..."):
+                try:
+                    context = summarize(library.add_pdf(pdf_file))
+                    st.success("✅ PDF content processed successfully!")
+                except Exception as e:
+                    st.error(f"❌ Error processing PDF: {str(e)}")
+
+    elif input_source == "Saved Sources":
+        if not len(library):
+            st.info("📚 No saved sources yet. Add a YouTube video or PDF on any page and it will appear here.")
+        else:
+            source_id = st.selectbox("📚 Pick a saved source", library.ids(), format_func=library.label, key=f"{key}_saved")
+            with st.spinner("🔄 Loading saved source..."):
+                try:
+                    context = summarize(source_id)
+                    st.success(f"✅ Using {library.label(source_id)}")
+                except Exception as e:
+                    st.error(f"❌ Error summarizing saved source: {str(e)}")
+
+    if context:
+        with st.expander("📄 Context summary"):
+            st.markdown(context)
+
+    return input_source, context
+
 # Custom CSS (keeping your existing styles)
 st.markdown("""
 <style>
@@ -349,29 +457,7 @@ def lecture_generator():
     
     # Source Selection
     st.markdown("### 📖 Content Source (Optional)")
-    input_source = st.radio("Choose context source", ["None", "YouTube Video", "PDF Notes"], horizontal=True)
-    context = ""
-    if input_source == "YouTube Video":
-        url = st.text_input("🎥 YouTube URL", placeholder="https://www.youtube.com/watch?v=...")
-        if url:
-            with st.spinner("🔄 Extracting and summarizing transcript..."):
-                try:
-                    transcript = extract_youtube_transcript(url)
-                    context = summarize_text(transcript, topic)
-                    st.success("✅ Transcript processed successfully!")
-                except Exception as e:
-                    st.error(f"❌ Error processing YouTube URL: {str(e)}")
-                    
-    elif input_source == "PDF Notes":
-        pdf_file = st.file_uploader("📄 Upload PDF Notes", type=["pdf"], help="Upload your study materials")
-        if pdf_file:
-            with st.spinner("📖 Extracting and summarizing PDF content..."):
-                try:
-                    text = extract_pdf_text(pdf_file)
-                    context = summarize_text(text, topic)
-                    st.success("✅ PDF content processed successfully!")
-                except Exception as e:
-                    st.error(f"❌ Error processing PDF: {str(e)}")
+    input_source, context = select_context(topic, key="lecture")
 
     # Customization Options
     st.markdown("### 🎨 Customization Options")
@@ -409,76 +495,99 @@ def lecture_generator():
         if not topic:
             st.warning("⚠️ Please enter a topic to continue.")
             return
-
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        try:
-            # Step 1: Generate slide content
-            status_text.text("🔄 Generating slide content...")
-            progress_bar.progress(20)
-            slide_md = generate_slide_content(topic, length, context=context, language=language)
-            slide_md_file = f"Lecture_{topic.replace(' ', '_')}.md"
-            with open(slide_md_file, "w", encoding="utf-8") as f:
-                f.write(slide_md)
-
-            # Step 2: Generate professor script
-            status_text.text("🎭 Creating professor script...")
-            progress_bar.progress(35)
-            persona_text, voice = persona_map[persona]
-            script = generate_professor_script(topic, slide_md, persona_text, context, language)
-            script_file = slide_md_file.replace(".md", f"_{language}_ProfessorScript.md")
-            with open(script_file, "w", encoding="utf-8") as f:
-                f.write(script)
-
-            # Step 3: Generate slides
-            status_text.text("🎨 Designing slides...")
-            progress_bar.progress(50)
-            generate_slides_from_markdown(slide_md_file, theme_choice=theme_choice)
-
-            pptx_path = slide_md_file.replace("Lecture", "Slides").replace(".md", ".pptx")
-
-            # Step 4: Convert to images
-            status_text.text("🖼️ Converting slides to images...")
-            progress_bar.progress(65)
-            pdf_path = convert_pptx_to_pdf(pptx_path)
-            slide_imgs = convert_pdf_to_images(pdf_path, output_folder=os.path.dirname(pptx_path))
-
-            # Step 5: Generate audio
-            status_text.text("🔊 Generating voiceover...")
-            progress_bar.progress(80)
-            generate_tts_per_slide(script_file, voice_name=voice)
-
-            # Step 6: Create final video
-            status_text.text("🎬 Creating final video...")
-            progress_bar.progress(95)
-            wav_files = sorted([f for f in os.listdir(".") if f.startswith("slide_") and f.endswith(".wav")])
-            img_paths = sorted([f for f in slide_imgs if f.endswith(".png")])
-            output_vid = pptx_path.replace(".pptx", ".mp4")
-            generate_advanced_synced_video(img_paths, wav_files, output_vid)
-
-            progress_bar.progress(100)
-            status_text.text("✅ Lecture generation complete!")
-            
-            # Success section
+        persona_text, voice = persona_map[persona]
+        job_id = start_lecture_job(topic, length, context, language, persona_text, voice, theme_choice)
+        # Kept in the URL too, so a reload or reconnect picks the running job back up
+        st.session_state["lecture_job"] = job_id
+        st.query_params["job"] = job_id
+
+    job_id = st.session_state.get("lecture_job") or st.query_params.get("job")
+    if job_id:
+        st.session_state["lecture_job"] = job_id
+        show_lecture_job(job_id)
+
+def _forget_lecture_job():
+    st.session_state.pop("lecture_job", None)
+    if "job" in st.query_params:
+        del st.query_params["job"]
+
+@st.fragment(run_every=1)
+def lecture_job_progress(job_id):
+    """Polls the job once a second; the pipeline itself runs on the job manager's workers."""
+    job = get_job_manager().get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    snapshot = job.snapshot()
+
+    st.progress(job.progress())
+    icons = {"pending": "⏳", "running": "🔄", "done": "✅", "skipped": "⏭️", "failed": "❌", "cancelled": "⛔"}
+    for name, info in snapshot["stages"].items():
+        st.text(f"{icons.get(info['status'], '•')} {STAGE_LABELS.get(name, name)}")
+    slide_stage = snapshot["stages"].get("slides_md", {})
+    if slide_stage.get("status") == "running" and slide_stage.get("detail"):
+        with st.expander("📄 Slide content", expanded=True):
+            st.markdown(slide_stage["detail"])
+
+    if "frames_notice" in snapshot["artifacts"]:
+        st.warning(snapshot["artifacts"]["frames_notice"])
+    if "preview" in snapshot["artifacts"]:
+        st.markdown("### 🎥 Preview (later slides are still being generated)")
+        hls_player(snapshot["artifacts"]["preview"])
+
+    if st.button("✖ Cancel generation", key=f"cancel_{job_id}"):
+        job.cancel()
+        st.info("Cancelling after the current step...")
+
+def show_lecture_job(job_id):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        st.warning("⚠️ This lecture job is no longer available. Please generate it again.")
+        _forget_lecture_job()
+        return
+    if not job.done:
+        st.caption(f"Job {job_id}: you can leave this page; generation continues in the background.")
+        lecture_job_progress(job_id)
+        return
+
+    snapshot = job.snapshot()
+    artifacts = snapshot["artifacts"]
+    if snapshot["status"] == "cancelled":
+        st.info("⛔ Lecture generation was cancelled.")
+    elif snapshot["status"] == "failed":
+        failed = [STAGE_LABELS.get(name, name) for name, info in snapshot["stages"].items() if info["status"] == "failed"]
+        st.error(f"❌ An error occurred{' during ' + failed[0] if failed else ''}: {snapshot['error']}")
+    else:
+        if st.session_state.get("lecture_celebrated") != job_id:
+            st.session_state["lecture_celebrated"] = job_id
             st.balloons()
-            st.success("🎉 Your lecture has been successfully generated!")
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                with open(pptx_path, "rb") as file:
-                    st.download_button("📥 Download Slides", data=file, file_name=os.path.basename(pptx_path))
-            with col2:
-                st.info(f"📊 Generated {len(slide_imgs)} slides with full narration")
-            
-            # Video player
-            st.markdown("### 🎥 Preview Your Lecture")
-            st.video(output_vid)
-            
-        except Exception as e:
-            st.error(f"❌ An error occurred: {str(e)}")
-            progress_bar.empty()
-            status_text.empty()
+        st.success("🎉 Your lecture has been successfully generated!")
+        if "frames_notice" in artifacts:
+            st.warning(artifacts["frames_notice"])
+
+        if "slide_md" in artifacts:
+            with open(artifacts["slide_md"], encoding="utf-8") as f:
+                with st.expander("📄 Slide content"):
+                    st.markdown(f.read())
+
+        col1, col2 = st.columns(2)
+        with col1:
+            with open(artifacts["pptx"], "rb") as file:
+                st.download_button("📥 Download Slides", data=file, file_name=os.path.basename(artifacts["pptx"]))
+            if "subtitles" in artifacts:
+                with open(artifacts["subtitles"], "rb") as file:
+                    st.download_button("💬 Download Subtitles", data=file,
+                                       file_name=os.path.basename(artifacts["subtitles"]))
+        with col2:
+            st.info(f"📊 Generated {len(artifacts.get('frames', []))} slides with full narration")
+
+        # Video player
+        st.markdown("### 🎥 Preview Your Lecture")
+        st.video(artifacts["video"])
+
+    if st.button("🆕 Start a new lecture", key="new_lecture"):
+        _forget_lecture_job()
+        st.rerun()
+
 
 def quiz_generator():
     configure_gemini()
@@ -503,31 +612,8 @@ def quiz_generator():
                                 help="Review Mode: Browse all questions without time pressure")
 
     st.markdown("### 📖 Content Source (Optional)")
-    input_source = st.radio("Choose context source", ["None", "YouTube Video", "PDF Notes"], horizontal=True)
     slide_md = ""
-    context = ""
-
-    if input_source == "YouTube Video":
-        url = st.text_input("🎥 YouTube URL", placeholder="https://www.youtube.com/watch?v=...")
-        if url:
-            with st.spinner("🔄 Extracting and summarizing transcript..."):
-                try:
-                    transcript = extract_youtube_transcript(url)
-                    context = summarize_text(transcript, topic)
-                    st.success("✅ Transcript processed successfully!")
-                except Exception as e:
-                    st.error(f"❌ Error processing YouTube URL: {str(e)}")
-                    
-    elif input_source == "PDF Notes":
-        pdf_file = st.file_uploader("📄 Upload PDF Notes", type=["pdf"], help="Upload your study materials")
-        if pdf_file:
-            with st.spinner("📖 Extracting and summarizing PDF content..."):
-                try:
-                    text = extract_pdf_text(pdf_file)
-                    context = summarize_text(text, topic)
-                    st.success("✅ PDF content processed successfully!")
-                except Exception as e:
-                    st.error(f"❌ Error processing PDF: {str(e)}")
+    input_source, context = select_context(topic, key="quiz")
 
     # Optional inputs
     with st.expander("📁 Optional Content Sources"):
@@ -941,31 +1027,8 @@ def flashcard_generator():
 
     col1, col2 = st.columns(2)
     st.markdown("### 📖 Content Source (Optional)")
-    input_source = st.radio("Choose context source", ["None", "YouTube Video", "PDF Notes"], horizontal=True)
     slide_md = ""
-    context = ""
-
-    if input_source == "YouTube Video":
-        url = st.text_input("🎥 YouTube URL", placeholder="https://www.youtube.com/watch?v=...")
-        if url:
-            with st.spinner("🔄 Extracting and summarizing transcript..."):
-                try:
-                    transcript = extract_youtube_transcript(url)
-                    context = summarize_text(transcript, topic)
-                    st.success("✅ Transcript processed successfully!")
-                except Exception as e:
-                    st.error(f"❌ Error processing YouTube URL: {str(e)}")
-                    
-    elif input_source == "PDF Notes":
-        pdf_file = st.file_uploader("📄 Upload PDF Notes", type=["pdf"], help="Upload your study materials")
-        if pdf_file:
-            with st.spinner("📖 Extracting and summarizing PDF content..."):
-                try:
-                    text = extract_pdf_text(pdf_file)
-                    context = summarize_text(text, topic)
-                    st.success("✅ PDF content processed successfully!")
-                except Exception as e:
-                    st.error(f"❌ Error processing PDF: {str(e)}")
+    input_source, context = select_context(topic, key="flashcards")
 
     with col1:
         difficulty = st.selectbox("🎖️ Difficulty Level", ["Easy", "Medium", "Hard"])
@@ -1292,22 +1355,9 @@ def notes_generator():
     st.title("🗒️ Notes Maker")
 
     topic = st.text_input("Enter Topic", key="notes_topic")
-    input_source = st.radio("Choose context source", ["None", "YouTube Video", "PDF Notes", "Manual Text"], key="notes_source")
-    context = ""
+    input_source, context = select_context(topic, key="notes", extra_sources=("Manual Text",), horizontal=False)
 
-    if input_source == "YouTube Video":
-        url = st.text_input("Enter YouTube URL", key="notes_youtube")
-        if url:
-            with st.spinner("Extracting and summarizing transcript..."):
-                transcript = extract_youtube_transcript(url)
-                context = summarize_text(transcript, topic)
-    elif input_source == "PDF Notes":
-        pdf_file = st.file_uploader("Upload PDF", type=["pdf"], key="notes_pdf")
-        if pdf_file:
-            with st.spinner("Extracting and summarizing PDF content..."):
-                text = extract_pdf_text(pdf_file)
-                context = summarize_text(text, topic)
-    elif input_source == "Manual Text":
+    if input_source == "Manual Text":
         manual_text = st.text_area("Paste your content here", key="notes_manual")
         if manual_text:
             context = manual_text
@@ -1322,14 +1372,16 @@ def notes_generator():
             st.warning("Please enter a topic.")
             return
 
+        st.subheader("📄 Generated Notes")
+        notes_view = st.empty()
         with st.spinner("Generating notes..."):
-            notes_md = generate_notes_gemini(topic, length, context=context, language=language)
-            notes_md_file = f"Notes_{topic.replace(' ', '_')}.md"
+            notes_md = generate_notes_gemini(topic, length, context=context, language=language,
+                                             on_progress=notes_view.markdown)
+            notes_md_file = Workspace().file(f"Notes_{sanitize_filename(topic)}.md")
             with open(notes_md_file, "w", encoding="utf-8") as f:
                 f.write(notes_md)
 
-        st.subheader("📄 Generated Notes")
-        st.markdown(notes_md)
+        notes_view.markdown(notes_md)
 
         # Convert MD → TXT
         txt_file = notes_md_file.replace(".md", ".txt")
@@ -0,0 +1,262 @@
+import errno
+import hashlib
+import os
+import shutil
+import threading
+import time
+from collections import OrderedDict
+
+# Root for every on-disk cache (transcripts, audio, checkpoints); override per deployment
+CACHE_DIR = os.environ.get("COLLEGEAI_CACHE_DIR", ".collegeai_cache")
+
+
+def cache_key(*parts):
+    """Build a stable content-addressed key from any number of str/bytes parts."""
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        elif not isinstance(part, (bytes, bytearray)):
+            part = repr(part).encode("utf-8")
+        h.update(len(part).to_bytes(8, "big"))
+        h.update(part)
+    return h.hexdigest()
+
+def file_digest(path, block_size=1024 * 1024):
+    """sha256 of a file's contents, read in blocks."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def link_file(src, dest):
+    """Hard-link `src` at `dest` (replacing it), copying instead where links are impossible."""
+    if os.path.lexists(dest):
+        os.remove(dest)
+    try:
+        os.link(src, dest)
+    except FileNotFoundError:
+        raise
+    except OSError:
+        shutil.copyfile(src, dest)  # other filesystem, or no hard-link support
+    return dest
+
+
+class LRUCache:
+    """
+    Thread-safe in-memory LRU cache bounded by entry count and, optionally,
+    by a total weight (e.g. characters of text) computed with `weigher`.
+    """
+
+    def __init__(self, max_entries=128, max_weight=None, weigher=len):
+        self.max_entries = max_entries
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._weights = {}
+        self._total_weight = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        weight = self.weigher(value) if self.max_weight is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._total_weight -= self._weights.pop(key)
+                del self._data[key]
+            self._data[key] = value
+            self._weights[key] = weight
+            self._total_weight += weight
+            self._evict()
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _evict(self):
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_weight is not None and self._total_weight > self.max_weight and len(self._data) > 1)
+        ):
+            old_key, _ = self._data.popitem(last=False)
+            self._total_weight -= self._weights.pop(old_key)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self._total_weight = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._data), "weight": self._total_weight, "hits": self.hits, "misses": self.misses}
+
+
+class DiskCache:
+    """
+    Persistent blob store: one file per key under `directory`. Entries expire after
+    `ttl` seconds (None = never) and the least recently used are evicted once the
+    directory grows past `max_bytes`. Safe to share between threads and processes.
+    """
+
+    def __init__(self, directory, ttl=None, max_bytes=None, suffix=".bin"):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, cache_key(key) + self.suffix)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+            if self.ttl is not None and time.time() - mtime > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path, (time.time(), mtime))  # atime marks recency for LRU eviction
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        if self.max_bytes is not None:
+            self._evict()
+
+    def file_path(self, key):
+        """Path of the stored file for `key` (recency refreshed), or None on a miss/expiry."""
+        path = self._path(key)
+        try:
+            mtime = os.path.getmtime(path)
+            if self.ttl is not None and time.time() - mtime > self.ttl:
+                os.remove(path)
+                raise FileNotFoundError(path)
+            os.utime(path, (time.time(), mtime))
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return path
+
+    def link(self, key, dest):
+        """
+        Hard-link (or copy) the stored file for `key` to `dest` and return `dest`, or None
+        on a miss. The caller's copy survives eviction of the entry by other jobs.
+        """
+        path = self.file_path(key)
+        if path is None:
+            return None
+        try:
+            return link_file(path, dest)
+        except FileNotFoundError:
+            return None  # evicted since the lookup
+
+    def put_file(self, key, src_path):
+        """Move an already written file into the cache and return its stored path."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        try:
+            os.replace(src_path, path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            # Different filesystem: copy next to the entry first so the swap stays atomic
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, path)
+            os.remove(src_path)
+        if self.max_bytes is not None:
+            self._evict()
+        return path
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def _entries(self):
+        if not os.path.isdir(self.directory):
+            return []
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append((max(st.st_atime, st.st_mtime), st.st_size, st.st_mtime, name))
+        return entries
+
+    def _evict(self):
+        with self._lock:
+            entries = self._entries()
+            now = time.time()
+            total = sum(size for _, size, _, _ in entries)
+            for last_used, size, mtime, name in sorted(entries):
+                expired = self.ttl is not None and now - mtime > self.ttl
+                if not expired and total <= self.max_bytes:
+                    continue
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                    total -= size
+                except FileNotFoundError:
+                    pass
+
+    def clear(self):
+        for _, _, _, name in self._entries():
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        entries = self._entries()
+        return {
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _, _ in entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_MISSING = object()
@@ -1,32 +1,262 @@
 from youtube_transcript_api import YouTubeTranscriptApi
 import fitz  # PyMuPDF
-from google.generativeai import GenerativeModel
+from llm import MODEL_NAME, generate_text
 from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import get_context
+import hashlib
 import os
+import re
+import tempfile
+import threading
+from cache import CACHE_DIR, DiskCache, LRUCache, cache_key
+from pdftext import extract_page_range
 
-def extract_youtube_transcript(youtube_url):
-    print("Extracting YouTube transcript...")
-    video_id = parse_qs(urlparse(youtube_url).query).get('v')
-    if not video_id:
-        # Handle youtu.be URLs
-        video_id = youtube_url.split("/")[-1]
-    else:
-        video_id = video_id[0]
-    ytt_api = YouTubeTranscriptApi()
-    fetched = ytt_api.fetch(video_id)
+SUMMARY_MODEL = MODEL_NAME
+
+# ---- MAP-REDUCE SUMMARY SETTINGS ----
+CHUNK_SIZE = 12000           # max characters sent to the model per chunk
+FAN_OUT = 4                  # partial summaries merged per reduce call
+MAX_PARALLEL_SUMMARIES = 4   # concurrent model calls while summarizing
+PAGE_BREAK = "\f"
+
+# ---- PDF EXTRACTION SETTINGS ----
+# Measured: a spawned worker takes ~0.3 s to start (interpreter + PyMuPDF), while a dense
+# page extracts in ~3 ms (sparse ones in ~1 ms). With 4 workers the pool only pays off from
+# ~110 dense pages, so smaller documents are read in-process.
+PARALLEL_PDF_MIN_PAGES = 200
+
+# ---- MEMO CACHES (process-wide, survive Streamlit reruns) ----
+_extract_cache = LRUCache(max_entries=32, max_weight=50_000_000)
+_summary_cache = LRUCache(max_entries=256, max_weight=10_000_000)
+
+# ---- TRANSCRIPT STORE (on disk, shared by every session on this host) ----
+TRANSCRIPT_TTL = 7 * 24 * 3600
+TRANSCRIPT_STORE_BYTES = 200 * 1024 * 1024
+_transcript_store = DiskCache(os.path.join(CACHE_DIR, "transcripts"), ttl=TRANSCRIPT_TTL,
+                              max_bytes=TRANSCRIPT_STORE_BYTES, suffix=".txt")
+_ytt_api = None
+_ytt_api_lock = threading.Lock()
+
+_VIDEO_ID_RE = re.compile(r'^[A-Za-z0-9_-]{11}$')
+_PATH_PREFIXES = ("embed", "shorts", "live", "v", "e")
+
+def get_video_id(youtube_url):
+    """
+    Normalize a YouTube link to its 11-character video id. Handles watch?v=, youtu.be,
+    /embed/, /shorts/, /live/ and /v/ paths, extra query strings and bare ids.
+    """
+    url = youtube_url.strip()
+    if _VIDEO_ID_RE.match(url):
+        return url
+    if "://" not in url:
+        url = "https://" + url
+    parsed = urlparse(url)
+    host = parsed.netloc.lower()
+    parts = [p for p in parsed.path.split("/") if p]
+
+    candidate = ""
+    query_id = parse_qs(parsed.query).get('v')
+    if query_id:
+        candidate = query_id[0]
+    elif host.endswith("youtu.be") and parts:
+        candidate = parts[0]
+    elif len(parts) >= 2 and parts[0] in _PATH_PREFIXES:
+        candidate = parts[1]
+    elif parts:
+        candidate = parts[-1]
+
+    if not _VIDEO_ID_RE.match(candidate):
+        raise ValueError(f"Could not find a YouTube video id in {youtube_url!r}")
+    return candidate
+
+def read_pdf_bytes(pdf_file):
+    """Return the raw bytes of a PDF given a path, bytes or a file-like (e.g. Streamlit upload)."""
+    if isinstance(pdf_file, (bytes, bytearray)):
+        return bytes(pdf_file)
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, "rb") as f:
+            return f.read()
+    if hasattr(pdf_file, "getvalue"):
+        return pdf_file.getvalue()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+def youtube_source_key(youtube_url):
+    return f"yt:{get_video_id(youtube_url)}"
+
+def pdf_source_key(pdf_bytes):
+    return f"pdf:{hashlib.sha256(pdf_bytes).hexdigest()}"
+
+def _get_ytt_api():
+    # One client for the whole process so its HTTP session is reused between fetches
+    global _ytt_api
+    with _ytt_api_lock:
+        if _ytt_api is None:
+            _ytt_api = YouTubeTranscriptApi()
+        return _ytt_api
+
+def fetch_transcript(video_id):
+    fetched = _get_ytt_api().fetch(video_id)
     transcript = fetched.to_raw_data()  # 🔥 Fix here!
-    text = " ".join([t['text'] for t in transcript])
+    return " ".join([t['text'] for t in transcript])
+
+def extract_youtube_transcript(youtube_url, use_store=True):
+    video_id = get_video_id(youtube_url)
+    if use_store:
+        stored = _transcript_store.get(video_id)
+        if stored is not None:
+            return stored.decode("utf-8")
+    print("Extracting YouTube transcript...")
+    text = fetch_transcript(video_id)
+    _transcript_store.put(video_id, text.encode("utf-8"))
     return text
 
-def extract_pdf_text(pdf_path):
+def prefetch_transcripts(youtube_urls, max_workers=4):
+    """
+    Warm the transcript store for a list of URLs (e.g. a course playlist).
+    Returns {url: None on success, or the error message}.
+    """
+    def prefetch(url):
+        try:
+            extract_youtube_transcript(url)
+            return None
+        except Exception as e:
+            return str(e)
+
+    urls = list(dict.fromkeys(youtube_urls))
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        return dict(zip(urls, pool.map(prefetch, urls)))
+
+def _open_pdf(pdf_source):
+    # Paths are opened directly; uploads and bytes are opened from memory (no temp file)
+    if isinstance(pdf_source, (str, os.PathLike)):
+        return fitz.open(pdf_source)
+    return fitz.open(stream=read_pdf_bytes(pdf_source), filetype="pdf")
+
+def iter_pdf_pages(pdf_source):
+    """Yield the text of each page in order, holding only one page's text at a time."""
+    with _open_pdf(pdf_source) as doc:
+        for page in doc:
+            yield page.get_text()
+
+def extract_pdf_pages_parallel(pdf_source, workers=None):
+    """
+    Extract page texts with contiguous page ranges split across a process pool.
+    Workers are spawned (the caller is multi-threaded, so forking is unsafe) and
+    open the document by path; in-memory PDFs are written to one temp file first
+    instead of being pickled to every worker.
+    """
+    if not isinstance(pdf_source, (str, os.PathLike)):
+        pdf_bytes = read_pdf_bytes(pdf_source)
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(pdf_bytes)
+            return extract_pdf_pages_parallel(tmp_path, workers)
+        finally:
+            os.remove(tmp_path)
+
+    with _open_pdf(pdf_source) as doc:
+        page_count = doc.page_count
+
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    if workers <= 1:
+        return list(iter_pdf_pages(pdf_source))
+
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=get_context("spawn")) as pool:
+        futures = [pool.submit(extract_page_range, pdf_source, start, stop) for start, stop in ranges]
+        return [text for future in futures for text in future.result()]
+
+def extract_pdf_text(pdf_path, parallel=None, workers=None):
+    """
+    Extract the text of a PDF (path, bytes or uploaded file), pages separated by PAGE_BREAK.
+    `parallel=None` uses the process pool only for documents of PARALLEL_PDF_MIN_PAGES or more.
+    """
     print("Extracting PDF text...")
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-    return text
+    if not isinstance(pdf_path, (str, os.PathLike)):
+        pdf_path = read_pdf_bytes(pdf_path)
+    if parallel is None:
+        with _open_pdf(pdf_path) as doc:
+            parallel = doc.page_count >= PARALLEL_PDF_MIN_PAGES and (os.cpu_count() or 1) > 1
+    if parallel:
+        pages = extract_pdf_pages_parallel(pdf_path, workers=workers)
+    else:
+        pages = iter_pdf_pages(pdf_path)
+    return PAGE_BREAK.join(pages)
+
+def _generate(prompt, model_name, on_progress=None):
+    return generate_text(prompt, model_name=model_name, on_progress=on_progress)
+
+def _hard_split(text, chunk_size):
+    # Last resort for unpunctuated text (e.g. auto-generated transcripts): cut at whitespace
+    while len(text) > chunk_size:
+        cut = text.rfind(" ", 0, chunk_size)
+        if cut <= 0:
+            cut = chunk_size
+        yield text[:cut]
+        text = text[cut:]
+    if text:
+        yield text
+
+def _split_units(text, chunk_size):
+    for page in text.split(PAGE_BREAK):
+        if len(page) < chunk_size:
+            yield page + "\n"
+            continue
+        for sentence in re.split(r'(?<=[.!?])\s+', page):
+            if len(sentence) < chunk_size:
+                yield sentence + " "
+            else:
+                yield from _hard_split(sentence, chunk_size)
+
+def split_text_chunks(text, chunk_size=CHUNK_SIZE):
+    """
+    Split text into chunks of at most `chunk_size` characters, breaking on page
+    boundaries first, then sentence boundaries, then whitespace.
+    """
+    chunks = []
+    current, current_len = [], 0
+    for unit in _split_units(text, chunk_size):
+        if current and current_len + len(unit) > chunk_size:
+            chunks.append("".join(current).strip())
+            current, current_len = [], 0
+        current.append(unit)
+        current_len += len(unit)
+    if current:
+        chunks.append("".join(current).strip())
+    return [c for c in chunks if c]
+
+def _summarize_chunk(chunk, topic, model_name):
+    prompt = f"""
+You are an expert educator. The text below is one part of a longer document about '{topic}'.
+Write a dense, factual Markdown bullet summary of this part only. Keep definitions, formulas,
+names, numbers and examples. Do not add an introduction or conclusion.
+
+PART:
+\"\"\"
+{chunk}
+\"\"\"
+"""
+    return _generate(prompt, model_name)
+
+def _merge_summaries(summaries, topic, model_name):
+    joined = "\n\n---\n\n".join(summaries)
+    prompt = f"""
+You are an expert educator. Merge the following consecutive partial summaries of a document about '{topic}'
+into one dense, factual Markdown bullet summary. Keep the original order, remove repetition,
+and keep every distinct fact.
+
+PARTIAL SUMMARIES:
+\"\"\"
+{joined}
+\"\"\"
+"""
+    return _generate(prompt, model_name)
 
-def summarize_text(text, topic):
+def _summarize_final(text, topic, model_name, on_progress=None):
     prompt = f"""
 You are an expert educator. Summarize the following extracted content into a clear, beginner-friendly, structured Markdown summary for revision:
 
@@ -34,7 +264,7 @@ Topic: {topic}
 
 CONTENT:
 \"\"\"
-{text[:12000]}
+{text}
 \"\"\"
 
 STRUCTURE:
@@ -53,9 +283,43 @@ STRUCTURE:
 
 Keep it clean, clear, and structured in Markdown. Do not add any unnecessary sections.
 """
-    model = GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-    return response.text
+    return _generate(prompt, model_name, on_progress)
+
+def summarize_text(text, topic, model_name=SUMMARY_MODEL, chunk_size=CHUNK_SIZE,
+                   fan_out=FAN_OUT, max_workers=MAX_PARALLEL_SUMMARIES, on_progress=None):
+    """
+    Map-reduce summary: chunks are summarized concurrently, then merged `fan_out`
+    at a time level by level until a single structured summary remains.
+    `on_progress` streams the final structured summary (called on the caller's thread).
+    """
+    chunks = split_text_chunks(text, chunk_size)
+    if len(chunks) <= 1:
+        return _summarize_final(text, topic, model_name, on_progress)
+
+    fan_out = max(2, fan_out)
+    print(f"Summarizing {len(chunks)} chunks (fan-out {fan_out})...")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        partials = list(pool.map(lambda c: _summarize_chunk(c, topic, model_name), chunks))
+        while len(partials) > fan_out:
+            groups = [partials[i:i + fan_out] for i in range(0, len(partials), fan_out)]
+            partials = list(pool.map(lambda g: _merge_summaries(g, topic, model_name), groups))
+    return _summarize_final("\n\n".join(partials), topic, model_name, on_progress)
+
+# ---- MEMOIZED EXTRACT + SUMMARIZE ----
+def cached_source_text(source_key, extract):
+    """Return the extracted text for `source_key`, calling `extract()` only on a miss."""
+    return _extract_cache.get_or_compute(source_key, extract)
+
+def normalize_topic(topic):
+    """Canonical form of a topic: the same string keys the summary caches and goes into the prompt."""
+    return " ".join(str(topic or "").split())
+
+def cached_summary(source_key, text, topic, model_name=SUMMARY_MODEL, on_progress=None):
+    """Summarize `text` once per (source, topic, model); repeat calls cost no model call."""
+    topic = normalize_topic(topic)
+    key = cache_key(source_key, topic, model_name)
+    return _summary_cache.get_or_compute(
+        key, lambda: summarize_text(text, topic, model_name=model_name, on_progress=on_progress))
 
 def main():
     print("=== collegeAi Context Extractor ===")
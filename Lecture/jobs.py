@@ -0,0 +1,229 @@
+import atexit
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+
+# ---- JOB SETTINGS ----
+JOB_WORKERS = int(os.environ.get("COLLEGEAI_JOB_WORKERS", 2))  # pipelines running at once per process
+JOB_RETENTION = 24 * 3600  # seconds a finished job (and its artifact list) stays retrievable
+POLL_INTERVAL = 0.5        # seconds between cancellation / timeout checks while a stage runs
+
+# Job and stage states
+QUEUED, RUNNING, DONE, FAILED, CANCELLED, PENDING, SKIPPED = (
+    "queued", "running", "done", "failed", "cancelled", "pending", "skipped")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class StageTimeout(TimeoutError):
+    pass
+
+
+class Job:
+    """
+    One pipeline run. The worker thread reports through `run_stage` / `set_progress`
+    / `add_artifact`; the UI only reads `snapshot()`. Cancellation is cooperative:
+    it is observed between stages, and stage code polls `check_cancelled(stage)`
+    between units of work, which also stops a stage that ran past its timeout.
+    """
+
+    def __init__(self, kind, stages, stage_timeouts=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = QUEUED
+        self.error = None
+        self.result = None
+        self.created = time.time()
+        self.finished = None
+        self.stage_timeouts = dict(stage_timeouts or {})
+        self.stages = OrderedDict(
+            (name, {"status": PENDING, "progress": 0.0, "detail": None, "started": None, "finished": None})
+            for name in stages
+        )
+        self.artifacts = {}
+        self._cancel = threading.Event()
+        self._timed_out = {}  # stage -> its timeout, once exceeded
+        self._lock = threading.Lock()
+        self._stage_pool = ThreadPoolExecutor(max_workers=max(1, len(self.stages)),
+                                              thread_name_prefix=f"job-{self.id[:8]}")
+
+    # ---- called from the pipeline ----
+    def check_cancelled(self, stage=None):
+        """
+        Raise JobCancelled once the job is cancelled, and StageTimeout once `stage` has
+        run past its timeout. Stages hand `partial(job.check_cancelled, stage)` down to
+        their loops and rate-limited calls, so stopped work ends at the next check.
+        """
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+        if stage in self._timed_out:
+            raise StageTimeout(f"Stage '{stage}' exceeded its {self._timed_out[stage]}s timeout")
+
+    def set_progress(self, stage, progress=None, detail=None):
+        with self._lock:
+            info = self.stages[stage]
+            if progress is not None:
+                info["progress"] = max(0.0, min(1.0, progress))
+            if detail is not None:
+                info["detail"] = detail
+
+    def set_stage_status(self, stage, status):
+        with self._lock:
+            info = self.stages[stage]
+            info["status"] = status
+            if status == RUNNING:
+                info["started"] = time.time()
+            elif status in (DONE, SKIPPED):
+                info["progress"] = 1.0
+                info["finished"] = time.time()
+            elif status in (FAILED, CANCELLED):
+                info["finished"] = time.time()
+
+    def add_artifact(self, name, value):
+        with self._lock:
+            self.artifacts[name] = value
+
+    def run_stage(self, stage, fn, *args, timeout=None, **kwargs):
+        """
+        Run `fn(*args, **kwargs)` as `stage`, bounded by its timeout (argument, else
+        `stage_timeouts[stage]`). A stage that times out or is cancelled is stopped through
+        `check_cancelled(stage)`, and its thread is waited for before the stage is marked
+        failed or cancelled, so no stage work outlives its job's worker.
+        """
+        self.check_cancelled()
+        timeout = timeout if timeout is not None else self.stage_timeouts.get(stage)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self.set_stage_status(stage, RUNNING)
+        future = self._stage_pool.submit(fn, *args, **kwargs)
+        try:
+            while True:
+                try:
+                    result = future.result(timeout=POLL_INTERVAL)
+                    break
+                except FutureTimeout:
+                    pass
+                if deadline is not None and time.monotonic() > deadline:
+                    self._timed_out[stage] = timeout
+                if self._cancel.is_set() or stage in self._timed_out:
+                    wait([future])
+                    self.check_cancelled(stage)
+        except JobCancelled:
+            self.set_stage_status(stage, CANCELLED)
+            raise
+        except Exception:
+            self.set_stage_status(stage, FAILED)
+            raise
+        self.set_stage_status(stage, DONE)
+        return result
+
+    # ---- called from the UI ----
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def progress(self):
+        """Overall completion in [0, 1], averaged over stages."""
+        with self._lock:
+            if not self.stages:
+                return 1.0 if self.done else 0.0
+            return sum(info["progress"] for info in self.stages.values()) / len(self.stages)
+
+    def snapshot(self):
+        """Consistent copy of the job's state, safe to read from any thread."""
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "status": self.status,
+                "error": self.error,
+                "created": self.created,
+                "finished": self.finished,
+                "stages": OrderedDict((name, dict(info)) for name, info in self.stages.items()),
+                "artifacts": dict(self.artifacts),
+            }
+
+
+class JobManager:
+    """
+    Runs pipelines on a fixed worker pool, independent of any browser session.
+    `submit` returns a job id immediately; callers poll `get(job_id).snapshot()`.
+    Throughput is bounded by `workers`, not by the number of open tabs.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, retention=JOB_RETENTION):
+        self.retention = retention
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job-worker")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind, stages, fn, *args, stage_timeouts=None, **kwargs):
+        """Queue `fn(job, *args, **kwargs)`; its return value becomes `job.result`."""
+        job = Job(kind, stages, stage_timeouts)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def _run(self, job, fn, args, kwargs):
+        try:
+            job.check_cancelled()
+            job.status = RUNNING
+            job.result = fn(job, *args, **kwargs)
+            job.status = DONE
+        except JobCancelled:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = FAILED
+            traceback.print_exc()
+        finally:
+            job.finished = time.time()
+            job._stage_pool.shutdown(wait=True)
+            print(f"Job {job.id} ({job.kind}) {job.status}")
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is not None:
+            job.cancel()
+        return job is not None
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._pool.shutdown(wait=False)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_job_manager():
+    """Process-wide job manager, shared by every Streamlit session."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager()
+            atexit.register(_manager.shutdown)
+        return _manager
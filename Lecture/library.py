@@ -0,0 +1,71 @@
+import os
+import time
+from collections import OrderedDict
+from extractor import (
+    SUMMARY_MODEL, cached_source_text, cached_summary, extract_pdf_text, extract_youtube_transcript,
+    get_video_id, normalize_topic, pdf_source_key, read_pdf_bytes, youtube_source_key,
+)
+
+class SourceLibrary:
+    """
+    Ingested sources for one user session. Each source is stored once under a
+    stable id (its content key) with its raw text and one summary per topic, so
+    every page (Lecture, Quiz, Flashcards, Notes) can reuse it without re-ingesting.
+    """
+
+    def __init__(self, max_sources=20):
+        self.max_sources = max_sources
+        self._sources = OrderedDict()
+
+    def _store(self, source_id, kind, label, extract):
+        if source_id not in self._sources:
+            self._sources[source_id] = {
+                "id": source_id,
+                "kind": kind,
+                "label": label,
+                "text": cached_source_text(source_id, extract),
+                "summaries": {},
+                "added_at": time.time(),
+            }
+            while len(self._sources) > self.max_sources:
+                self._sources.popitem(last=False)
+        self._sources.move_to_end(source_id)
+        return source_id
+
+    def add_youtube(self, youtube_url):
+        source_id = youtube_source_key(youtube_url)
+        label = f"🎥 YouTube: {get_video_id(youtube_url)}"
+        return self._store(source_id, "youtube", label, lambda: extract_youtube_transcript(youtube_url))
+
+    def add_pdf(self, pdf_file):
+        pdf_bytes = read_pdf_bytes(pdf_file)
+        source_id = pdf_source_key(pdf_bytes)
+        name = getattr(pdf_file, "name", None) or (os.path.basename(pdf_file) if isinstance(pdf_file, str) else "PDF")
+        return self._store(source_id, "pdf", f"📄 {name}", lambda: extract_pdf_text(pdf_bytes))
+
+    def context(self, source_id, topic, model_name=SUMMARY_MODEL, on_progress=None):
+        """Return the summary of a stored source for `topic`, generating it at most once."""
+        source = self._sources[source_id]
+        topic = normalize_topic(topic)
+        summary_key = (topic, model_name)
+        if summary_key not in source["summaries"]:
+            source["summaries"][summary_key] = cached_summary(source_id, source["text"], topic, model_name,
+                                                              on_progress=on_progress)
+        return source["summaries"][summary_key]
+
+    def get(self, source_id):
+        return self._sources.get(source_id)
+
+    def ids(self):
+        # Most recently used first
+        return list(reversed(self._sources))
+
+    def label(self, source_id):
+        source = self._sources.get(source_id)
+        return source["label"] if source else source_id
+
+    def __contains__(self, source_id):
+        return source_id in self._sources
+
+    def __len__(self):
+        return len(self._sources)
@@ -0,0 +1,125 @@
+import os
+import threading
+import google.generativeai as generativeai
+from google import genai
+from google.genai import types
+from ratelimit import TEXT_LIMITER, TTS_LIMITER, estimate_tokens
+
+# ---- MODEL SETTINGS (single place for every generator) ----
+MODEL_NAME = "gemini-2.0-flash"
+TTS_MODEL_NAME = "gemini-2.5-flash-preview-tts"
+REQUEST_TIMEOUT = 120   # seconds per text call
+TTS_TIMEOUT = 180       # seconds per speech call
+CALL_DEADLINE = 300     # seconds per call including rate-limit waits and retries
+GENERATION_CONFIG = None  # e.g. {"temperature": 0.7}; None keeps the API defaults
+SAFETY_SETTINGS = None
+
+class EmptyAudioResponse(RuntimeError):
+    """The speech model answered without audio (happens transiently); worth retrying."""
+
+_lock = threading.Lock()
+_models = {}
+_tts_client = None
+_api_key = None
+
+def configure(api_key):
+    """Set the API key for every model call. Cached handles are dropped only when the key changes."""
+    global _api_key, _tts_client
+    with _lock:
+        if api_key == _api_key:
+            return
+        generativeai.configure(api_key=api_key)
+        _api_key = api_key
+        _models.clear()
+        _tts_client = None
+
+def get_model(model_name=MODEL_NAME):
+    """Return the shared GenerativeModel handle for `model_name` (its client and channel are reused)."""
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = generativeai.GenerativeModel(
+                model_name,
+                generation_config=GENERATION_CONFIG,
+                safety_settings=SAFETY_SETTINGS,
+            )
+            _models[model_name] = model
+        return model
+
+def get_tts_client():
+    """Return the shared google-genai client used for speech (keeps its HTTP connections alive)."""
+    global _tts_client
+    with _lock:
+        if _tts_client is None:
+            _tts_client = genai.Client(
+                api_key=_api_key or os.environ.get("GOOGLE_API_KEY"),
+                http_options=types.HttpOptions(timeout=TTS_TIMEOUT * 1000),
+            )
+        return _tts_client
+
+def generate_text(prompt, model_name=MODEL_NAME, timeout=REQUEST_TIMEOUT, deadline=CALL_DEADLINE, on_progress=None,
+                  check_cancelled=None):
+    """
+    Return the full completion. With `on_progress`, the response is streamed and
+    `on_progress(text_so_far)` is called as each chunk arrives. `check_cancelled()`
+    is polled while the call waits for the rate limiter; it raises to abandon the call.
+    """
+    if on_progress is not None:
+        text = ""
+        for chunk in stream_text(prompt, model_name, timeout, deadline, check_cancelled):
+            text += chunk
+            on_progress(text)
+        return text
+
+    def call():
+        response = get_model(model_name).generate_content(prompt, request_options={"timeout": timeout})
+        return response.text
+    return TEXT_LIMITER.call(call, tokens=estimate_tokens(prompt), deadline=deadline, check_cancelled=check_cancelled)
+
+def stream_text(prompt, model_name=MODEL_NAME, timeout=REQUEST_TIMEOUT, deadline=CALL_DEADLINE, check_cancelled=None):
+    """
+    Yield completion chunks as they arrive. Retries cover opening the stream; the
+    limiter's concurrency slot is held until the stream is exhausted or closed.
+    """
+    response = TEXT_LIMITER.stream(
+        lambda: get_model(model_name).generate_content(prompt, stream=True, request_options={"timeout": timeout}),
+        tokens=estimate_tokens(prompt),
+        deadline=deadline,
+        check_cancelled=check_cancelled,
+    )
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. the final finish-reason chunk)
+            continue
+        if text:
+            yield text
+
+def synthesize_speech(text, voice_name="Kore", model_name=TTS_MODEL_NAME, deadline=CALL_DEADLINE, check_cancelled=None):
+    """Return raw 24 kHz mono 16-bit PCM for `text`."""
+    return TTS_LIMITER.call(lambda: _synthesize(text, voice_name, model_name),
+                            tokens=estimate_tokens(text), deadline=deadline, check_cancelled=check_cancelled)
+
+def _synthesize(text, voice_name, model_name):
+    response = get_tts_client().models.generate_content(
+        model=model_name,
+        contents=text,
+        config=types.GenerateContentConfig(
+            response_modalities=["AUDIO"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(
+                        voice_name=voice_name,
+                    )
+                )
+            ),
+        )
+    )
+    try:
+        data = response.candidates[0].content.parts[0].inline_data.data
+    except (AttributeError, IndexError, TypeError):
+        data = None
+    if not data:
+        raise EmptyAudioResponse(f"No audio in the {model_name} response")
+    return data
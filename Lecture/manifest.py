@@ -0,0 +1,121 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_SAMPLE_RATE = 24000  # TTS output rate (TTS.SAMPLE_RATE)
+
+class LectureManifest:
+    """
+    Per-lecture index of slide sections. Each entry is keyed by its 1-based section
+    id and records title, frame path, audio path, sample count and duration, so
+    stages pair frames with audio by id instead of listing directories, and read
+    durations without opening audio files. Updates are thread-safe and written
+    atomically as compact JSON: immediately, or once at the end of a `batch()`.
+    """
+
+    def __init__(self, path, sample_rate=DEFAULT_SAMPLE_RATE):
+        self.path = path
+        self.sample_rate = sample_rate
+        self._sections = {}
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path):
+        """Read a manifest file (or a folder containing manifest.json)."""
+        if os.path.isdir(path):
+            path = os.path.join(path, MANIFEST_FILE)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        manifest = cls(path, data.get("sample_rate", DEFAULT_SAMPLE_RATE))
+        manifest._sections = {section["id"]: section for section in data.get("sections", [])}
+        return manifest
+
+    @classmethod
+    def open(cls, path, sample_rate=DEFAULT_SAMPLE_RATE):
+        """Load the manifest at `path` if it exists, else start an empty one there."""
+        if os.path.isdir(path):
+            path = os.path.join(path, MANIFEST_FILE)
+        return cls.load(path) if os.path.exists(path) else cls(path, sample_rate)
+
+    def _section(self, section_id):
+        return self._sections.setdefault(section_id, {
+            "id": section_id, "title": None, "frame": None, "audio": None, "samples": None, "duration": None,
+        })
+
+    def set_frame(self, section_id, frame_path, title=None):
+        with self._lock:
+            section = self._section(section_id)
+            section["frame"] = frame_path
+            if title is not None:
+                section["title"] = title
+            self._changed()
+
+    def set_audio(self, section_id, audio_path, samples, title=None):
+        with self._lock:
+            section = self._section(section_id)
+            section["audio"] = audio_path
+            section["samples"] = samples
+            section["duration"] = samples / self.sample_rate
+            if title is not None:
+                section["title"] = title
+            self._changed()
+
+    @contextmanager
+    def batch(self):
+        """
+        Defer writes until the block ends (one file write per stage instead of one
+        per section). Batches may overlap across threads; the file is written when
+        the last one ends.
+        """
+        with self._lock:
+            self._batches += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batches -= 1
+                if self._batches == 0 and self._dirty:
+                    self._save()
+
+    def sections(self):
+        """All sections, in id order."""
+        with self._lock:
+            return [dict(self._sections[section_id]) for section_id in sorted(self._sections)]
+
+    def get(self, section_id):
+        with self._lock:
+            section = self._sections.get(section_id)
+            return dict(section) if section else None
+
+    def complete_sections(self):
+        """Sections with both a frame and audio, in id order."""
+        return [section for section in self.sections() if section["frame"] and section["audio"]]
+
+    def _changed(self):
+        # Called with the lock held
+        if self._batches:
+            self._dirty = True
+        else:
+            self._save()
+
+    def _save(self):
+        data = {
+            "version": MANIFEST_VERSION,
+            "sample_rate": self.sample_rate,
+            "sections": [self._sections[section_id] for section_id in sorted(self._sections)],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_file = self.path + ".tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_file, self.path)
+        self._dirty = False
+
+    def save(self):
+        with self._lock:
+            self._save()
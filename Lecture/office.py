@@ -0,0 +1,295 @@
+import atexit
+import glob
+import json
+import os
+import queue
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future
+
+try:
+    # only importable with LibreOffice's Python bindings (e.g. python3-uno)
+    from office_bridge import connect, convert_document
+except ImportError:
+    connect = convert_document = None
+
+BRIDGE_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "office_bridge.py")
+
+# ---- POOL SETTINGS ----
+OFFICE_WORKERS = int(os.environ.get("COLLEGEAI_SOFFICE_WORKERS", 2))
+JOBS_PER_WORKER = 50       # recycle a soffice instance after this many conversions
+STARTUP_TIMEOUT = 60       # seconds to wait for a fresh instance to accept connections
+CONVERT_TIMEOUT = 120      # seconds per conversion before the instance is killed
+
+_SOFFICE_CANDIDATES = [
+    "/usr/bin/soffice",
+    "/usr/bin/libreoffice",
+    "/usr/local/bin/soffice",
+    "/usr/local/bin/libreoffice",
+    "/usr/lib/libreoffice/program/soffice",
+    "/opt/libreoffice*/program/soffice",
+    "/snap/bin/libreoffice",
+    "/Applications/LibreOffice.app/Contents/MacOS/soffice",
+]
+
+
+class OfficeNotFound(RuntimeError):
+    pass
+
+
+def find_soffice():
+    """Locate a LibreOffice binary: $COLLEGEAI_SOFFICE, then PATH, then common Linux/macOS locations."""
+    configured = os.environ.get("COLLEGEAI_SOFFICE")
+    if configured and os.path.exists(configured):
+        return configured
+    for name in ("soffice", "libreoffice"):
+        found = shutil.which(name)
+        if found:
+            return found
+    for pattern in _SOFFICE_CANDIDATES:
+        for path in sorted(glob.glob(pattern), reverse=True):
+            if os.access(path, os.X_OK):
+                return path
+    raise OfficeNotFound("LibreOffice not found. Install it (e.g. apt install libreoffice-impress) or set COLLEGEAI_SOFFICE.")
+
+
+def find_uno_python(binary):
+    """
+    A Python interpreter that can import `uno`, for running office_bridge.py when this one
+    cannot (the usual pip/venv install): $COLLEGEAI_UNO_PYTHON, LibreOffice's bundled Python
+    next to `binary`, then the system python3 (Debian/Ubuntu python3-uno). None if there is none.
+    """
+    program_dir = os.path.dirname(os.path.realpath(binary))
+    candidates = [
+        os.environ.get("COLLEGEAI_UNO_PYTHON", ""),
+        os.path.join(program_dir, "python"),
+        os.path.join(program_dir, "python.exe"),
+        os.path.join(program_dir, "..", "Resources", "python"),  # macOS app bundle
+        shutil.which("python3") or "",
+        "/usr/bin/python3",
+    ]
+    for candidate in candidates:
+        if not candidate or not os.access(candidate, os.X_OK):
+            continue
+        try:
+            probe = subprocess.run([candidate, "-c", "import uno"], capture_output=True, timeout=30)
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        if probe.returncode == 0:
+            return candidate
+    return None
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class _OfficeWorker:
+    """
+    One headless soffice with its own user profile, kept running and serving conversions
+    over a local socket: through UNO in this process when it has the bindings, else through
+    an office_bridge.py helper run by `bridge_python`. With neither, each job is a one-shot
+    `--convert-to` that still reuses this worker's already initialized profile.
+    """
+
+    def __init__(self, binary, index, bridge_python=None):
+        self.binary = binary
+        self.bridge_python = bridge_python
+        self.profile_dir = tempfile.mkdtemp(prefix=f"collegeai_soffice_{index}_")
+        self.profile_url = "file://" + self.profile_dir.replace(os.sep, "/")
+        self.process = None
+        self.bridge = None
+        self.desktop = None
+        self.jobs_done = 0
+
+    @property
+    def warm(self):
+        return self.desktop is not None or self.bridge is not None
+
+    def start(self):
+        if connect is None and self.bridge_python is None:
+            return
+        port = _free_port()
+        self.process = subprocess.Popen(
+            [
+                self.binary, "--headless", "--invisible", "--nologo", "--norestore",
+                "--nodefault", "--nolockcheck", f"-env:UserInstallation={self.profile_url}",
+                f"--accept=socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        if connect is not None:
+            try:
+                self.desktop = connect(port, STARTUP_TIMEOUT, alive=lambda: self.process.poll() is None)
+            except Exception:
+                self.stop()
+                raise
+            return
+        self.bridge = subprocess.Popen(
+            [self.bridge_python, BRIDGE_SCRIPT, str(port), str(STARTUP_TIMEOUT)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True,
+        )
+        # stop() kills the helper, which ends a readline stuck on a dead instance
+        watchdog = threading.Timer(STARTUP_TIMEOUT + 5, self.stop)
+        watchdog.start()
+        try:
+            ready = self._read_reply()
+        finally:
+            watchdog.cancel()
+        if not ready.get("ready"):
+            self.stop()
+            raise RuntimeError("LibreOffice instance failed to start")
+
+    def _read_reply(self):
+        bridge = self.bridge
+        line = bridge.stdout.readline() if bridge is not None else ""
+        return json.loads(line) if line.strip() else {}
+
+    def convert(self, src_path, pdf_path, timeout):
+        if not self.warm:
+            return self._convert_once(src_path, pdf_path, timeout)
+        src_path, pdf_path = os.path.abspath(src_path), os.path.abspath(pdf_path)
+        # A hung conversion cannot be interrupted over UNO, so kill the instance instead
+        watchdog = threading.Timer(timeout, self.stop)
+        watchdog.start()
+        try:
+            if self.desktop is not None:
+                convert_document(self.desktop, src_path, pdf_path)
+            else:
+                self.bridge.stdin.write(json.dumps({"src": src_path, "pdf": pdf_path}) + "\n")
+                self.bridge.stdin.flush()
+                reply = self._read_reply()
+                if not reply.get("ok"):
+                    raise RuntimeError(f"Conversion failed: {reply.get('error') or 'LibreOffice instance stopped'}")
+        finally:
+            watchdog.cancel()
+        self.jobs_done += 1
+        return pdf_path
+
+    def _convert_once(self, src_path, pdf_path, timeout):
+        output_dir = os.path.dirname(os.path.abspath(pdf_path))
+        result = subprocess.run(
+            [self.binary, "--headless", "--norestore", "--nolockcheck",
+             f"-env:UserInstallation={self.profile_url}",
+             "--convert-to", "pdf", "--outdir", output_dir, src_path],
+            capture_output=True, text=True, timeout=timeout,
+        )
+        produced = os.path.join(output_dir, os.path.splitext(os.path.basename(src_path))[0] + ".pdf")
+        if result.returncode != 0 or not os.path.exists(produced):
+            raise RuntimeError(f"Conversion failed: {result.stderr.strip()}")
+        if os.path.abspath(produced) != os.path.abspath(pdf_path):
+            os.replace(produced, pdf_path)
+        self.jobs_done += 1
+        return pdf_path
+
+    def alive(self):
+        if not self.warm:
+            return True
+        running = self.process is not None and self.process.poll() is None
+        return running and (self.bridge is None or self.bridge.poll() is None)
+
+    def stop(self):
+        self.desktop = None
+        bridge, self.bridge = self.bridge, None
+        for process in (bridge, self.process):
+            if process is not None and process.poll() is None:
+                process.kill()
+                process.wait()
+        self.process = None
+
+    def close(self):
+        self.stop()
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+
+class OfficePool:
+    """
+    Fixed pool of headless LibreOffice workers fed from a job queue. Each worker has an
+    isolated profile and is recycled after `jobs_per_worker` conversions or a failure,
+    so callers pay only the render time, not soffice start-up. That needs `uno`, in this
+    interpreter or another one (see find_uno_python); `status` says which, and without
+    either every conversion cold-starts soffice.
+    """
+
+    def __init__(self, size=OFFICE_WORKERS, jobs_per_worker=JOBS_PER_WORKER, binary=None):
+        self.binary = binary or find_soffice()
+        self.jobs_per_worker = jobs_per_worker
+        self.bridge_python = None if connect is not None else find_uno_python(self.binary)
+        if connect is not None:
+            self.status = "warm: LibreOffice kept running, driven over UNO in-process"
+        elif self.bridge_python is not None:
+            self.status = f"warm: LibreOffice kept running, driven over UNO by {self.bridge_python}"
+        else:
+            self.status = ("cold: no Python with LibreOffice's uno module was found (install python3-uno "
+                           "or set COLLEGEAI_UNO_PYTHON), so every conversion starts soffice from scratch")
+            print(f"⚠️ LibreOffice pool is {self.status}")
+        self._jobs = queue.Queue()
+        self._threads = []
+        for index in range(max(1, size)):
+            thread = threading.Thread(target=self._run, args=(index,), daemon=True, name=f"soffice-{index}")
+            thread.start()
+            self._threads.append(thread)
+
+    def _run(self, index):
+        worker = None
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            src_path, pdf_path, timeout, future = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                if worker is None or not worker.alive() or worker.jobs_done >= self.jobs_per_worker:
+                    if worker is not None:
+                        worker.close()
+                    worker = _OfficeWorker(self.binary, index, self.bridge_python)
+                    worker.start()
+                future.set_result(worker.convert(src_path, pdf_path, timeout))
+            except Exception as e:
+                if worker is not None:
+                    worker.close()
+                    worker = None
+                future.set_exception(e)
+        if worker is not None:
+            worker.close()
+
+    def submit(self, src_path, pdf_path=None, timeout=CONVERT_TIMEOUT):
+        """Queue a conversion; returns a Future resolving to the PDF path."""
+        pdf_path = pdf_path or os.path.splitext(src_path)[0] + ".pdf"
+        future = Future()
+        self._jobs.put((src_path, pdf_path, timeout, future))
+        return future
+
+    def convert(self, src_path, pdf_path=None, timeout=CONVERT_TIMEOUT):
+        return self.submit(src_path, pdf_path, timeout).result()
+
+    def shutdown(self):
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout=10)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_office_pool():
+    """Process-wide pool, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = OfficePool()
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def office_pool_status():
+    """How the shared pool converts (warm or cold, and why), or None before its first use."""
+    return _pool.status if _pool is not None else None
@@ -0,0 +1,70 @@
+"""
+UNO side of the LibreOffice pool (office.py). Imported directly when the app's Python has
+LibreOffice's `uno` module; otherwise office.py runs this file as a long-lived helper
+under a Python that does (python3-uno, or LibreOffice's bundled interpreter), talking
+one JSON request / reply per line over stdin/stdout:
+
+    python office_bridge.py <port> <startup timeout>
+    -> {"ready": true}
+    <- {"src": "/abs/deck.pptx", "pdf": "/abs/deck.pdf"}
+    -> {"ok": true}  or  {"error": "..."}
+
+Only the standard library and `uno` may be imported here.
+"""
+import json
+import sys
+import time
+
+import uno
+from com.sun.star.beans import PropertyValue
+
+
+def _props(**kwargs):
+    props = []
+    for name, value in kwargs.items():
+        prop = PropertyValue()
+        prop.Name = name
+        prop.Value = value
+        props.append(prop)
+    return tuple(props)
+
+
+def connect(port, timeout, alive=None):
+    """Desktop of the soffice listening on `port`, retried until it accepts or `timeout` passes."""
+    local_ctx = uno.getComponentContext()
+    resolver = local_ctx.ServiceManager.createInstanceWithContext("com.sun.star.bridge.UnoUrlResolver", local_ctx)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            ctx = resolver.resolve(f"uno:socket,host=127.0.0.1,port={port};urp;StarOffice.ComponentContext")
+            return ctx.ServiceManager.createInstanceWithContext("com.sun.star.frame.Desktop", ctx)
+        except Exception:
+            if (alive is not None and not alive()) or time.monotonic() > deadline:
+                raise RuntimeError("LibreOffice instance failed to start")
+            time.sleep(0.25)
+
+
+def convert_document(desktop, src_path, pdf_path):
+    doc = desktop.loadComponentFromURL(uno.systemPathToFileUrl(src_path), "_blank", 0, _props(Hidden=True))
+    try:
+        doc.storeToURL(uno.systemPathToFileUrl(pdf_path), _props(FilterName="impress_pdf_Export"))
+    finally:
+        doc.close(True)
+    return pdf_path
+
+
+def main():
+    desktop = connect(int(sys.argv[1]), float(sys.argv[2]))
+    print(json.dumps({"ready": True}), flush=True)
+    for line in sys.stdin:
+        request = json.loads(line)
+        try:
+            convert_document(desktop, request["src"], request["pdf"])
+            reply = {"ok": True}
+        except Exception as e:
+            reply = {"error": f"{type(e).__name__}: {e}"}
+        print(json.dumps(reply), flush=True)
+
+
+if __name__ == "__main__":
+    main()
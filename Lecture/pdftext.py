@@ -0,0 +1,10 @@
+import fitz  # PyMuPDF
+
+# Process-pool worker for extractor.extract_pdf_pages_parallel. It lives in its own module
+# and imports nothing but PyMuPDF, so a spawned worker does not pay for `import extractor`
+# (the Gemini SDK, caches, transcript API).
+
+def extract_page_range(pdf_path, start, stop):
+    """Text of pages [start, stop) of the PDF at `pdf_path`; each worker opens its own handle."""
+    with fitz.open(pdf_path) as doc:
+        return [doc[i].get_text() for i in range(start, stop)]
@@ -0,0 +1,378 @@
+import json
+import os
+from collections import namedtuple
+from functools import partial
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from advance import HLSWriter, generate_advanced_synced_video
+from cache import CACHE_DIR, cache_key, file_digest, link_file
+from jobs import SKIPPED, get_job_manager
+from manifest import MANIFEST_FILE, LectureManifest
+from office import office_pool_status
+from render import MissingGlyphs, render_slides_from_markdown
+from script import generate_slide_content, generate_professor_script
+from slides import generate_slides_from_markdown, split_slide_markdown
+from subs import generate_subtitles_from_sections
+from TTS import SAMPLE_RATE, synthesize_script_audio
+from video import convert_pdf_to_images, convert_pptx_to_pdf
+from workspace import Workspace, sanitize_filename
+
+# Progressive previews are served by Streamlit static serving (.streamlit/config.toml) from ./static
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+PREVIEW_ROOT = os.path.join(STATIC_DIR, "hls")
+
+# ---- STAGE CHECKPOINTS: one directory per stage output, named by the hash of its inputs ----
+# Stages never write into the shared checkpoint tree: each runs in a folder of its job's
+# workspace, and a finished stage is published by linking its files into a temporary
+# directory that is renamed onto the key in one step. Restoring links the files back into
+# the job, so a job only ever reads its own copies.
+CHECKPOINT_ROOT = os.path.join(CACHE_DIR, "checkpoints")
+CHECKPOINT_TTL = int(os.environ.get("COLLEGEAI_CHECKPOINT_TTL", 7 * 24 * 3600))
+CHECKPOINT_VERSION = 2  # bump when a stage's output format changes
+_RESULT_FILE = "result.json"
+
+# A pipeline node: `deps` feed the stage and its checkpoint key, `params` are hashed into the key
+Stage = namedtuple("Stage", ["name", "deps", "fn", "params"])
+
+def result_digest(value):
+    """
+    Content hash of a stage result: files it points to are hashed by their bytes, not
+    their (job-local) paths, so equal outputs give equal digests in every job.
+    """
+    if isinstance(value, dict):
+        return cache_key("dict", *[part for name in sorted(value) for part in (name, result_digest(value[name]))])
+    if isinstance(value, list):
+        return cache_key("list", *[result_digest(item) for item in value])
+    if isinstance(value, str) and os.path.isabs(value) and os.path.isfile(value):
+        return cache_key("file", file_digest(value))
+    return cache_key("value", json.dumps(value, ensure_ascii=False))
+
+def stage_key(stage, digests):
+    """Checkpoint key: stage name + parameters + the result digests of the stages it depends on."""
+    params = json.dumps(stage.params, sort_keys=True, ensure_ascii=False)
+    return cache_key("stage", CHECKPOINT_VERSION, stage.name, params, *[digests[dep] for dep in stage.deps])
+
+def _checkpoint_path(key):
+    return os.path.join(CHECKPOINT_ROOT, key)
+
+def _link_tree(src, dst):
+    # Hard-link (or copy) every stage file under `src` into `dst`; markers and result.json stay behind
+    for dirpath, _, filenames in os.walk(src):
+        target = os.path.join(dst, os.path.relpath(dirpath, src))
+        os.makedirs(target, exist_ok=True)
+        for name in filenames:
+            if name != _RESULT_FILE and not name.startswith("."):
+                link_file(os.path.join(dirpath, name), os.path.join(target, name))
+
+def _relocate(value, src, dst):
+    # Rewrite paths under `src` inside a stage result to the same files under `dst`
+    if isinstance(value, str) and (value == src or value.startswith(src + os.sep)):
+        return dst + value[len(src):]
+    if isinstance(value, list):
+        return [_relocate(item, src, dst) for item in value]
+    if isinstance(value, dict):
+        return {name: _relocate(item, src, dst) for name, item in value.items()}
+    return value
+
+def load_checkpoint(key):
+    """Result of a completed stage, or None. A hit also postpones the checkpoint's expiry."""
+    path = os.path.join(_checkpoint_path(key), _RESULT_FILE)
+    try:
+        with open(path, encoding="utf-8") as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    Workspace(root=CHECKPOINT_ROOT, job_id=key, ttl=CHECKPOINT_TTL)
+    return result
+
+def save_checkpoint(key, stage_dir, result):
+    """
+    Publish a finished stage's files and result under `key`. The checkpoint is
+    assembled in a private temporary directory and renamed into place, so readers see
+    either nothing or a complete checkpoint; if another job published the same key
+    first, its checkpoint is kept.
+    """
+    final = _checkpoint_path(key)
+    if os.path.exists(os.path.join(final, _RESULT_FILE)):
+        return
+    tmp = Workspace(root=CHECKPOINT_ROOT, ttl=CHECKPOINT_TTL)
+    try:
+        _link_tree(stage_dir, tmp.path)
+        with open(os.path.join(tmp.path, _RESULT_FILE), "w", encoding="utf-8") as f:
+            json.dump(_relocate(result, stage_dir, final), f, ensure_ascii=False)
+        try:
+            os.replace(tmp.path, final)
+        except OSError:
+            pass  # published concurrently by a job with the same inputs
+    finally:
+        tmp.cleanup()
+
+def restore_checkpoint(key, stage_dir):
+    """Link a checkpoint's files into `stage_dir` and return its result pointing there, or None."""
+    result = load_checkpoint(key)
+    if result is None:
+        return None
+    final = _checkpoint_path(key)
+    try:
+        _link_tree(final, stage_dir)
+    except FileNotFoundError:
+        return None  # expired while being restored
+    return _relocate(result, final, stage_dir)
+
+def _run_node(job, stage, key, inputs, workspace):
+    # Each stage writes into its own folder of the job's workspace
+    stage_workspace = workspace.sub("stages", stage.name)
+    result = job.run_stage(stage.name, stage.fn, job, stage_workspace, inputs, **stage.params)
+    save_checkpoint(key, stage_workspace.path, result)
+    return result
+
+def run_graph(job, stages, on_result=None, workspace=None):
+    """
+    Run `stages` (listed in dependency order) as a DAG on `job`. Stages whose
+    checkpoint exists are skipped; every other stage starts as soon as its
+    dependencies finish, so independent branches run in parallel. After a failure
+    no new stage starts, running ones finish (keeping their checkpoints) and the
+    first error is raised; a rerun resumes at the failed stage.
+    Stage files live in `workspace` (default: the job's workspace), restored ones included.
+    `on_result(name, result)` is called as each stage's result becomes available.
+    """
+    workspace = workspace or Workspace(job_id=job.id)
+    listed = set()
+    for stage in stages:
+        missing = [dep for dep in stage.deps if dep not in listed]
+        if missing:
+            raise ValueError(f"Stage '{stage.name}' listed before its dependencies {missing}")
+        listed.add(stage.name)
+
+    # Keys are computed once a stage's inputs exist, from what its dependencies produced
+    results, digests, pending, running, error = {}, {}, list(stages), {}, None
+
+    def finished(name, result):
+        results[name] = result
+        digests[name] = result_digest(result)
+        if on_result is not None:
+            on_result(name, result)
+
+    with ThreadPoolExecutor(max_workers=len(stages)) as pool:
+        while pending or running:
+            scheduled = True
+            while error is None and scheduled:
+                scheduled = False
+                for stage in [s for s in pending if all(d in results for d in s.deps)]:
+                    pending.remove(stage)
+                    scheduled = True
+                    key = stage_key(stage, digests)
+                    cached = restore_checkpoint(key, workspace.sub("stages", stage.name).path)
+                    if cached is not None:
+                        job.set_stage_status(stage.name, SKIPPED)
+                        job.set_progress(stage.name, detail="reused checkpoint")
+                        finished(stage.name, cached)
+                        continue
+                    inputs = {dep: results[dep] for dep in stage.deps}
+                    running[pool.submit(_run_node, job, stage, key, inputs, workspace)] = stage
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                finished(stage.name, result)
+    if error is not None:
+        raise error
+    return results
+
+# ---- LECTURE PIPELINE ----
+LECTURE_STAGES = ["context", "slides_md", "script", "pptx", "frames", "audio", "video", "subtitles"]
+STAGE_LABELS = {
+    "context": "📖 Preparing context",
+    "slides_md": "🔄 Generating slide content",
+    "script": "🎭 Creating professor script",
+    "pptx": "🎨 Designing slides",
+    "frames": "🖼️ Rendering slide frames",
+    "audio": "🔊 Generating voiceover",
+    "video": "🎬 Creating final video",
+    "subtitles": "💬 Writing subtitles",
+}
+STAGE_TIMEOUTS = {  # seconds per stage
+    "context": 60,
+    "slides_md": 300,
+    "script": 600,
+    "pptx": 120,
+    "frames": 300,
+    "audio": 1800,
+    "video": 600,
+    "subtitles": 60,
+}
+
+def _write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+def _context_stage(job, workspace, inputs, text):
+    return {"text": text}
+
+def _slides_md_stage(job, workspace, inputs, topic, length, language, name):
+    def on_progress(text):
+        job.set_progress("slides_md", detail=text)
+        job.check_cancelled("slides_md")  # raising here closes the stream
+
+    slide_md = generate_slide_content(topic, length, context=inputs["context"]["text"], language=language,
+                                      on_progress=on_progress)
+    return {"text": slide_md, "path": _write(workspace.file(f"Lecture_{name}.md"), slide_md)}
+
+def _script_stage(job, workspace, inputs, topic, persona_text, language, name):
+    script = generate_professor_script(topic, inputs["slides_md"]["text"], persona_text,
+                                       inputs["context"]["text"], language, parallel=True,
+                                       check_cancelled=partial(job.check_cancelled, "script"))
+    path = workspace.file(f"Lecture_{name}_{sanitize_filename(language)}_ProfessorScript.md")
+    return {"text": script, "path": _write(path, script)}
+
+def _pptx_stage(job, workspace, inputs, theme_choice, name):
+    return {"path": generate_slides_from_markdown(inputs["slides_md"]["path"], theme_choice=theme_choice,
+                                                  output_file=workspace.file(f"Slides_{name}.pptx"))}
+
+def _office_frames(job, workspace, inputs, theme_choice, preview, manifest, reason):
+    # LibreOffice falls back across system fonts per glyph, which Pillow cannot do
+    job.set_progress("frames", 0.0, detail=f"{reason}; rendering through LibreOffice")
+    pptx = generate_slides_from_markdown(inputs["slides_md"]["path"], theme_choice=theme_choice,
+                                         output_file=workspace.file("frames_deck.pptx"))
+    pdf = convert_pptx_to_pdf(pptx, pdf_file=workspace.file("frames_deck.pdf"))
+    if pdf is None:
+        raise RuntimeError(f"{reason}, and the LibreOffice fallback failed (see the log)")
+    slide_imgs = convert_pdf_to_images(pdf, workspace.dir("frames"), manifest=manifest)
+    job.add_artifact("frames_notice", f"{reason}, so the slides were rendered through LibreOffice "
+                                      f"({office_pool_status()}).")
+    for idx, path in enumerate(slide_imgs):
+        preview.add_frame(idx, path)
+    return slide_imgs
+
+def _frames_stage(job, workspace, inputs, theme_choice, language, preview, manifest):
+    # The .pptx is only a download artifact; video frames are rendered directly, unless no
+    # installed font can draw the deck's script. Each frame is recorded in the manifest and
+    # handed to the preview the moment it exists.
+    try:
+        slide_imgs = render_slides_from_markdown(inputs["slides_md"]["text"], theme_choice=theme_choice,
+                                                 output_folder=workspace.dir("frames"), on_frame=preview.add_frame,
+                                                 manifest=manifest, language=language,
+                                                 check_cancelled=partial(job.check_cancelled, "frames"))
+    except MissingGlyphs as e:
+        slide_imgs = _office_frames(job, workspace, inputs, theme_choice, preview, manifest, str(e))
+    return {"paths": slide_imgs}
+
+def _audio_stage(job, workspace, inputs, voice, preview, manifest):
+    # Narration i is paired with slide i by id: one audio section per slide, silent where
+    # the script has nothing to say (e.g. a title or preamble)
+    script = inputs["script"]["text"]
+    slide_titles = [title for title, _ in split_slide_markdown(inputs["slides_md"]["text"])]
+    total = len(slide_titles)
+    saved = []
+
+    def on_section(idx, section):
+        job.set_progress("audio", (idx + 1) / total, detail=section["title"])
+        pcm_path = workspace.file(f"section_{idx+1}.pcm")
+        with open(pcm_path, "wb") as f:
+            f.write(section["pcm"])
+        saved.append({"title": section["title"], "text": section["text"], "samples": section["samples"],
+                      "duration": section["duration"], "pcm": pcm_path})
+        manifest.set_audio(idx + 1, pcm_path, section["samples"], title=section["title"])
+        # A slide is encoded as soon as both its narration and its frame exist
+        preview.add_audio(idx, section)
+
+    with manifest.batch():
+        synthesize_script_audio(script, voice_name=voice, on_section=on_section, slide_titles=slide_titles,
+                                check_cancelled=partial(job.check_cancelled, "audio"))
+    return {"sections": saved}
+
+def _video_stage(job, workspace, inputs, name, preview, manifest):
+    # Segments were already encoded for the preview, so this is mostly segment-cache hits + stream copy
+    check_cancelled = partial(job.check_cancelled, "video")
+    preview.finish(check_cancelled)
+    incomplete = [section["id"] for section in manifest.sections() if not (section["frame"] and section["audio"])]
+    if incomplete:
+        raise ValueError(f"Sections {incomplete} are missing a frame or audio")
+    sections = manifest.sections()  # paired by section id, in order
+    return {"path": generate_advanced_synced_video([section["frame"] for section in sections],
+                                                   [section["audio"] for section in sections],
+                                                   workspace.file(f"Lecture_{name}.mp4"),
+                                                   check_cancelled=check_cancelled)}
+
+def _subtitles_stage(job, workspace, inputs, name):
+    return {"path": generate_subtitles_from_sections(inputs["audio"]["sections"],
+                                                     workspace.file(f"Lecture_{name}.srt"))}
+
+def lecture_graph(topic, length, context, language, persona_text, voice, theme_choice, preview, manifest):
+    """
+    Stage graph for one lecture. pptx, frames and the script (then audio) are
+    independent branches; `preview` pairs frames with audio per slide as they appear,
+    and `manifest` records every frame and narration by section id.
+    """
+    shared = {"preview": preview, "manifest": manifest}
+    name = sanitize_filename(topic)
+    return [
+        Stage("context", (), _context_stage, {"text": context or ""}),
+        Stage("slides_md", ("context",), _slides_md_stage,
+              {"topic": topic, "length": length, "language": language, "name": name}),
+        Stage("script", ("slides_md", "context"), _script_stage,
+              {"topic": topic, "persona_text": persona_text, "language": language, "name": name}),
+        Stage("pptx", ("slides_md",), _pptx_stage, {"theme_choice": theme_choice, "name": name}),
+        Stage("frames", ("slides_md",), partial(_frames_stage, **shared),
+              {"theme_choice": theme_choice, "language": language}),
+        Stage("audio", ("script", "slides_md"), partial(_audio_stage, **shared), {"voice": voice}),
+        Stage("video", ("frames", "audio"), partial(_video_stage, **shared), {"name": name}),
+        Stage("subtitles", ("audio",), _subtitles_stage, {"name": name}),
+    ]
+
+def run_lecture(job, topic, length, context, language, persona_text, voice, theme_choice):
+    """
+    The lecture pipeline as a job: runs the stage graph, resuming from checkpoints,
+    and publishes the user-facing files (all inside the job's workspace) as
+    artifacts. Returns the video path.
+    """
+    workspace = Workspace(job_id=job.id)
+    # The preview is served publicly, so it gets its own short-lived workspace under ./static
+    preview_dir = Workspace(root=PREVIEW_ROOT, job_id=job.id).path
+    preview = HLSWriter(preview_dir, on_publish=lambda count: job.add_artifact("preview", preview_dir))
+    manifest = LectureManifest(workspace.file(MANIFEST_FILE), sample_rate=SAMPLE_RATE)
+    job.add_artifact("manifest", manifest.path)
+
+    def on_result(name, result):
+        # Stages restored from a checkpoint still fill the manifest and feed the preview
+        # (repeats from stages that just ran are harmless)
+        if name == "frames":
+            with manifest.batch():
+                for idx, path in enumerate(result["paths"]):
+                    manifest.set_frame(idx + 1, path)
+                    preview.add_frame(idx, path)
+        elif name == "audio":
+            with manifest.batch():
+                for idx, section in enumerate(result["sections"]):
+                    manifest.set_audio(idx + 1, section["pcm"], section["samples"], title=section["title"])
+                    preview.add_audio(idx, section)
+
+    graph = lecture_graph(topic, length, context, language, persona_text, voice, theme_choice, preview, manifest)
+    try:
+        results = run_graph(job, graph, on_result=on_result, workspace=workspace)
+    except BaseException:
+        preview.close()
+        raise
+    # Also when the video stage was restored from a checkpoint and never closed the playlist
+    preview.finish()
+    job.add_artifact("slide_md", results["slides_md"]["path"])
+    job.add_artifact("script", results["script"]["path"])
+    job.add_artifact("pptx", results["pptx"]["path"])
+    job.add_artifact("frames", [section["frame"] for section in manifest.sections() if section["frame"]])
+    job.add_artifact("video", results["video"]["path"])
+    job.add_artifact("subtitles", results["subtitles"]["path"])
+    return results["video"]["path"]
+
+def start_lecture_job(topic, length, context, language, persona_text, voice, theme_choice):
+    """Queue a lecture on the shared job manager and return its job id immediately."""
+    return get_job_manager().submit(
+        "lecture", LECTURE_STAGES, run_lecture,
+        topic, length, context, language, persona_text, voice, theme_choice,
+        stage_timeouts=STAGE_TIMEOUTS,
+    )
@@ -1,7 +1,7 @@
 import json
 import re
 import streamlit as st
-from google.generativeai import GenerativeModel
+from llm import generate_text
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -245,15 +245,14 @@ Rules:
 """
 
     try:
-        model = GenerativeModel("gemini-2.0-flash")
-        response = model.generate_content(prompt)
+        response_text = generate_text(prompt)
         
-        if not response or not response.text:
+        if not response_text:
             print("Error: Empty response from model")
             return []
         
         # Clean the response text
-        cleaned_text = clean_json_response(response.text)
+        cleaned_text = clean_json_response(response_text)
         
         # Parse JSON
         quiz_data = json.loads(cleaned_text)
@@ -288,7 +287,7 @@ Rules:
         return []
     except Exception as e:
         print(f"Error generating quiz: {e}")
-        print(f"Raw model output: {response.text if 'response' in locals() else 'No response'}")
+        print(f"Raw model output: {response_text if 'response_text' in locals() else 'No response'}")
         return []
 
 # ------------------ TEST ------------------
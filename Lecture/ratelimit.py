@@ -0,0 +1,255 @@
+import os
+import random
+import threading
+import time
+
+# HTTP statuses worth retrying; 429/503 also mean "the service is overloaded, slow down"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+OVERLOAD_STATUS = {429, 503}
+
+
+class RateLimitTimeout(TimeoutError):
+    """Raised when a call cannot be admitted or retried before its deadline."""
+
+
+def _status_code(exc):
+    # google.api_core exceptions and google.genai APIError both expose `.code`
+    for attr in ("code", "status_code"):
+        code = getattr(exc, attr, None)
+        if isinstance(code, int):
+            return code
+    response = getattr(exc, "response", None)
+    code = getattr(response, "status_code", None)
+    return code if isinstance(code, int) else None
+
+
+def is_retryable(exc):
+    if isinstance(exc, RateLimitTimeout):
+        return False
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    return _status_code(exc) in RETRY_STATUS
+
+
+def is_overload(exc):
+    return _status_code(exc) in OVERLOAD_STATUS
+
+
+CHECK_INTERVAL = 0.5  # seconds between `check_cancelled` polls while waiting
+
+
+def sleep(seconds, check_cancelled=None):
+    """time.sleep in short slices, calling `check_cancelled()` (which raises to stop) between them."""
+    end = time.monotonic() + seconds
+    while True:
+        if check_cancelled is not None:
+            check_cancelled()
+        remaining = end - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, CHECK_INTERVAL))
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate_per_minute`."""
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1, deadline=None, check_cancelled=None):
+        amount = min(amount, self.capacity)  # an oversized request must still be admissible
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            if deadline is not None and time.monotonic() + wait > deadline:
+                raise RateLimitTimeout("rate limit wait would exceed the call deadline")
+            sleep(min(wait, 1.0), check_cancelled)
+
+
+class AIMDLimiter:
+    """
+    Adaptive concurrency limit: grows by one slot per window of successful calls
+    (additive increase) and is cut by `decrease` when the service signals overload
+    (multiplicative decrease). `acquire` returns the current window; overloads from
+    calls admitted before the last decrease are ignored, so a burst of 429s from one
+    window cuts the limit once instead of once per failed call.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=32, decrease=0.5):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.in_flight = 0
+        self.window = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, deadline=None, check_cancelled=None):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    raise RateLimitTimeout("no concurrency slot before the call deadline")
+                if check_cancelled is not None:
+                    check_cancelled()
+                    timeout = CHECK_INTERVAL if timeout is None else min(timeout, CHECK_INTERVAL)
+                self._cond.wait(timeout)
+            self.in_flight += 1
+            return self.window
+
+    def release(self, overloaded=False, window=None):
+        with self._cond:
+            self.in_flight -= 1
+            if overloaded:
+                if window is None or window == self.window:
+                    self.limit = max(self.minimum, self.limit * self.decrease)
+                    self.window += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+
+
+class RateLimiter:
+    """
+    Process-wide admission control for one API: requests-per-minute and
+    tokens-per-minute buckets, AIMD concurrency, and jittered exponential
+    retries on 429/5xx bounded by a per-call deadline. `check_cancelled`, when given,
+    is polled before each attempt and while waiting; it raises to abandon the call.
+    """
+
+    def __init__(self, name, rpm, tpm, initial_concurrency=4, max_concurrency=32):
+        self.name = name
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.concurrency = AIMDLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        self.retries = 0
+        self.throttled = 0
+
+    def call(self, fn, tokens=1, deadline=300, max_attempts=6, base_delay=1.0, max_delay=30.0, check_cancelled=None):
+        """Run `fn()` under the limiter; `deadline` is the total budget in seconds, retries included."""
+        result, _ = self._admit(fn, tokens, deadline, max_attempts, base_delay, max_delay,
+                                check_cancelled=check_cancelled)
+        return result
+
+    def stream(self, fn, tokens=1, deadline=300, max_attempts=6, base_delay=1.0, max_delay=30.0,
+               check_cancelled=None):
+        """
+        Yield the items of the iterable returned by `fn()`. Opening the stream is
+        retried like `call`; the concurrency slot is then held until the stream is
+        exhausted or closed, and an overload raised mid-stream shrinks the limit
+        (it is not retried, since items were already yielded).
+        """
+        iterator, window = self._admit(lambda: iter(fn()), tokens, deadline, max_attempts, base_delay, max_delay,
+                                       hold=True, check_cancelled=check_cancelled)
+        overloaded = False
+        try:
+            yield from iterator
+        except Exception as e:
+            overloaded = is_overload(e)
+            if overloaded:
+                self.throttled += 1
+            raise
+        finally:
+            self.concurrency.release(overloaded, window)
+
+    def _admit(self, fn, tokens, deadline, max_attempts, base_delay, max_delay, hold=False, check_cancelled=None):
+        # Returns (fn(), window); with `hold`, a successful call keeps its concurrency slot
+        deadline_at = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            attempt += 1
+            if check_cancelled is not None:
+                check_cancelled()
+            self.requests.acquire(1, deadline_at, check_cancelled)
+            self.tokens.acquire(tokens, deadline_at, check_cancelled)
+            window = self.concurrency.acquire(deadline_at, check_cancelled)
+            overloaded = False
+            succeeded = False
+            try:
+                result = fn()
+                succeeded = True
+                return result, window
+            except Exception as e:
+                # Recorded before any re-raise, so a final 429 still counts as overload
+                overloaded = is_overload(e)
+                if overloaded:
+                    self.throttled += 1
+                if not is_retryable(e) or attempt >= max_attempts:
+                    raise
+                delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))  # full jitter
+                if time.monotonic() + delay > deadline_at:
+                    raise
+                self.retries += 1
+                print(f"[{self.name}] retry {attempt}/{max_attempts - 1} in {delay:.1f}s after: {e}")
+            finally:
+                if not (hold and succeeded):
+                    self.concurrency.release(overloaded, window)
+            sleep(delay, check_cancelled)
+
+    def stats(self):
+        return {
+            "concurrency_limit": round(self.concurrency.limit, 2),
+            "in_flight": self.concurrency.in_flight,
+            "retries": self.retries,
+            "throttled": self.throttled,
+        }
+
+
+def estimate_tokens(text):
+    # ~4 characters per token is close enough for budgeting
+    return max(1, len(text) // 4)
+
+
+# ---- PROCESS-WIDE LIMITERS (tune to the project's Gemini quota) ----
+TEXT_LIMITER = RateLimiter(
+    "text",
+    rpm=int(os.environ.get("COLLEGEAI_TEXT_RPM", 1000)),
+    tpm=int(os.environ.get("COLLEGEAI_TEXT_TPM", 1_000_000)),
+    initial_concurrency=8,
+)
+# Gemini TTS quotas per billing tier as (requests/min, input tokens/min), from the
+# published limits of the preview TTS models. COLLEGEAI_GEMINI_TIER picks the row
+# (free, 1, 2 or 3; default 1, the lowest paid tier); COLLEGEAI_TTS_RPM/_TPM override it.
+TTS_TIER_QUOTAS = {
+    "free": (3, 10_000),
+    "1": (10, 10_000),
+    "2": (1_000, 100_000),
+    "3": (1_000, 1_000_000),
+}
+TTS_CALL_SECONDS = 20   # typical latency of one TTS chunk; turns a rate into calls in flight
+TTS_CHUNK_TOKENS = 750  # a full TTS_CHUNK_CHARS chunk, by estimate_tokens
+
+
+def tts_concurrency(rpm, tpm, maximum):
+    """
+    Calls in flight needed to use a TTS quota: the sustainable call rate (the lower of
+    the request and token budgets) times the latency of one call, by Little's law.
+    """
+    calls_per_minute = min(rpm, tpm / TTS_CHUNK_TOKENS)
+    return max(1, min(maximum, -(-int(calls_per_minute * TTS_CALL_SECONDS) // 60)))
+
+
+_tts_rpm, _tts_tpm = TTS_TIER_QUOTAS.get(os.environ.get("COLLEGEAI_GEMINI_TIER", "1").lower(), TTS_TIER_QUOTAS["1"])
+_tts_rpm = int(os.environ.get("COLLEGEAI_TTS_RPM", _tts_rpm))
+_tts_tpm = int(os.environ.get("COLLEGEAI_TTS_TPM", _tts_tpm))
+_tts_max_concurrency = int(os.environ.get("COLLEGEAI_TTS_MAX_CONCURRENCY", 16))
+# The starting limit follows the quota (4 on tier 1, the maximum on tiers 2 and 3) unless
+# COLLEGEAI_TTS_CONCURRENCY pins it; AIMD then moves it between 1 and the maximum.
+TTS_LIMITER = RateLimiter(
+    "tts",
+    rpm=_tts_rpm,
+    tpm=_tts_tpm,
+    initial_concurrency=int(os.environ.get("COLLEGEAI_TTS_CONCURRENCY",
+                                           tts_concurrency(_tts_rpm, _tts_tpm, _tts_max_concurrency))),
+    max_concurrency=_tts_max_concurrency,
+)
@@ -0,0 +1,288 @@
+import os
+import unicodedata
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
+from PIL import Image, ImageDraw, ImageFont, features
+from slides import THEMES, parse_slide_markdown
+
+# ---- FRAME SETTINGS ----
+VIDEO_SIZE = (1280, 720)
+FOOTER_TEXT = "Generated by collegeAi"
+PARALLEL_RENDER_MIN_SLIDES = 4  # smaller decks render faster in-process than via a pool
+
+class MissingGlyphs(Exception):
+    """Raised when no installed font can draw a deck's text (it would render as boxes)."""
+
+# Latin fallbacks, first found wins; COLLEGEAI_SLIDE_FONT / _BOLD are always tried first
+_FONT_PATHS = {
+    False: [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+        "/Library/Fonts/Arial.ttf",
+        "/System/Library/Fonts/Supplemental/Arial.ttf",
+        "C:\\Windows\\Fonts\\arial.ttf",
+        "DejaVuSans.ttf",
+    ],
+    True: [
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+        "/Library/Fonts/Arial Bold.ttf",
+        "/System/Library/Fonts/Supplemental/Arial Bold.ttf",
+        "C:\\Windows\\Fonts\\arialbd.ttf",
+        "DejaVuSans-Bold.ttf",
+    ],
+}
+
+# Unicode blocks of the non-Latin scripts the app offers, and the fonts that cover them
+# (Debian/Ubuntu fonts-noto-core and fonts-noto-cjk, Windows, macOS)
+_SCRIPT_RANGES = [
+    ("devanagari", 0x0900, 0x097F), ("bengali", 0x0980, 0x09FF), ("tamil", 0x0B80, 0x0BFF),
+    ("telugu", 0x0C00, 0x0C7F), ("kannada", 0x0C80, 0x0CFF), ("malayalam", 0x0D00, 0x0D7F),
+    ("cjk", 0x3000, 0x30FF), ("cjk", 0x3400, 0x9FFF), ("cjk", 0xAC00, 0xD7AF), ("cjk", 0xFF00, 0xFFEF),
+]
+_COMPLEX_SCRIPTS = {"devanagari", "bengali", "tamil", "telugu", "kannada", "malayalam"}  # need shaping
+_LANGUAGE_SCRIPTS = {
+    "hindi": "devanagari", "marathi": "devanagari", "nepali": "devanagari", "bengali": "bengali",
+    "tamil": "tamil", "telugu": "telugu", "kannada": "kannada", "malayalam": "malayalam",
+    "chinese": "cjk", "japanese": "cjk", "korean": "cjk",
+}
+
+def _noto(family):
+    return {
+        False: [f"/usr/share/fonts/truetype/noto/{family}-Regular.ttf",
+                f"/usr/share/fonts/opentype/noto/{family}-Regular.otf"],
+        True: [f"/usr/share/fonts/truetype/noto/{family}-Bold.ttf",
+               f"/usr/share/fonts/opentype/noto/{family}-Bold.otf"],
+    }
+
+def _indic_fonts(family, mac_name):
+    fonts = _noto(family)
+    fonts[False] += ["C:\\Windows\\Fonts\\Nirmala.ttf", f"/System/Library/Fonts/Supplemental/{mac_name}.ttc"]
+    fonts[True] += ["C:\\Windows\\Fonts\\NirmalaB.ttf"]
+    return fonts
+
+_SCRIPT_FONTS = {
+    "devanagari": _indic_fonts("NotoSansDevanagari", "Devanagari Sangam MN"),
+    "bengali": _indic_fonts("NotoSansBengali", "Bangla Sangam MN"),
+    "tamil": _indic_fonts("NotoSansTamil", "Tamil Sangam MN"),
+    "telugu": _indic_fonts("NotoSansTelugu", "Telugu Sangam MN"),
+    "kannada": _indic_fonts("NotoSansKannada", "Kannada Sangam MN"),
+    "malayalam": _indic_fonts("NotoSansMalayalam", "Malayalam Sangam MN"),
+    "cjk": {
+        False: ["/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+                "/usr/share/fonts/truetype/noto/NotoSansCJK-Regular.ttc",
+                "/System/Library/Fonts/Hiragino Sans GB.ttc",
+                "C:\\Windows\\Fonts\\msyh.ttc"],
+        True: ["/usr/share/fonts/opentype/noto/NotoSansCJK-Bold.ttc",
+               "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
+               "C:\\Windows\\Fonts\\msyhbd.ttc"],
+    },
+}
+
+# Shaped (raqm) layout where Pillow has it; without it Indic conjuncts and vowel signs break
+_LAYOUT = ImageFont.Layout.RAQM if features.check("raqm") else ImageFont.Layout.BASIC
+_font_cache = {}
+
+def _font(size, bold=False, fonts=None):
+    """`fonts` maps bold -> font path, as chosen by select_fonts; None uses Pillow's default font."""
+    path = (fonts or {}).get(bold)
+    key = (size, path)
+    if key not in _font_cache:
+        _font_cache[key] = (ImageFont.truetype(path, size, layout_engine=_LAYOUT) if path
+                            else ImageFont.load_default(size=size))
+    return _font_cache[key]
+
+def _scripts(text):
+    found = set()
+    for char in set(text):
+        code = ord(char)
+        for script, low, high in _SCRIPT_RANGES:
+            if low <= code <= high:
+                found.add(script)
+    return found
+
+def _covers(path, chars):
+    # Glyph lookup only (unshaped), so a missing character shows up as the .notdef glyph
+    try:
+        font = (ImageFont.truetype(path, 24, layout_engine=ImageFont.Layout.BASIC) if path
+                else ImageFont.load_default(size=24))
+    except OSError:
+        return False
+    notdef = font.getmask("\U0010FFFD")
+    notdef = (notdef.size, bytes(notdef))
+    for char in chars:
+        mask = font.getmask(char)
+        if (mask.size, bytes(mask)) == notdef:
+            return False
+    return True
+
+def select_fonts(text, language=None):
+    """
+    Pick the regular and bold fonts for a deck: the fonts of the deck's language and of
+    every script in its text come first, then the Latin fallbacks, and the first font
+    that has a glyph for every character wins. Raises MissingGlyphs when none does, or
+    when the text needs shaping and Pillow was built without raqm.
+    """
+    scripts = _scripts(text)
+    preferred = _LANGUAGE_SCRIPTS.get((language or "").strip().lower())
+    ordered = ([preferred] if preferred else []) + sorted(scripts - {preferred})
+    if scripts & _COMPLEX_SCRIPTS and _LAYOUT != ImageFont.Layout.RAQM:
+        raise MissingGlyphs(f"{', '.join(sorted(scripts & _COMPLEX_SCRIPTS))} text needs Pillow built with raqm")
+    chars = {char for char in text if not char.isspace() and unicodedata.category(char)[0] not in "CM"}
+
+    fonts = {}
+    for bold, env in ((False, "COLLEGEAI_SLIDE_FONT"), (True, "COLLEGEAI_SLIDE_FONT_BOLD")):
+        candidates = [os.environ.get(env, "")]
+        for script in ordered:
+            candidates += _SCRIPT_FONTS.get(script, {}).get(bold, [])
+        candidates += _FONT_PATHS[bold]
+        candidates = [path for path in candidates if path and (os.path.exists(path) or not os.path.isabs(path))]
+        if not scripts:
+            candidates.append(None)  # Pillow's built-in font covers Latin
+        fonts[bold] = next((path for path in candidates if _covers(path, chars)), False)
+    if fonts[False] is False:
+        raise MissingGlyphs(f"No installed font covers the {', '.join(ordered) or 'slide'} text; "
+                            "install fonts-noto-core / fonts-noto-cjk or set COLLEGEAI_SLIDE_FONT")
+    if fonts[True] is False:
+        fonts[True] = fonts[False]
+    return fonts
+
+def _wrap(draw, text, font, max_width):
+    lines, current = [], ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and draw.textlength(candidate, font=font) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines or [""]
+
+def _clean(text):
+    return text.replace("**", "").replace("`", "").strip()
+
+def _draw_footer(draw, theme, width, height, fonts=None):
+    # Same placement as slides.add_footer: 0.3in from the left, 6.8in down a 7.5in slide
+    font = _font(max(12, height // 45), fonts=fonts)
+    draw.text((width * 0.3 / 10, height * 6.8 / 7.5), FOOTER_TEXT, fill=tuple(theme["font_color"]), font=font)
+
+def render_slide(slide, theme_choice, path, size=VIDEO_SIZE, fonts=None):
+    """
+    Draw one slide straight to an image at video resolution. `slide` is
+    ("title", title) for the title slide or (section_title, body_lines);
+    `fonts` comes from select_fonts.
+    """
+    theme = THEMES.get(theme_choice, THEMES["1"])
+    width, height = size
+    image = Image.new("RGB", size, tuple(theme["bg_color"]))
+    draw = ImageDraw.Draw(image)
+    margin = width // 16
+
+    kind, payload = slide
+    if kind == "title":
+        title_font = _font(height // 11, bold=True, fonts=fonts)
+        subtitle_font = _font(height // 26, fonts=fonts)
+        title_lines = _wrap(draw, _clean(payload), title_font, width - 2 * margin)
+        line_height = int(title_font.size * 1.2)
+        y = height * 0.42 - line_height * len(title_lines) / 2
+        for line in title_lines:
+            draw.text((width / 2, y), line, fill=tuple(theme["font_color"]), font=title_font, anchor="ma")
+            y += line_height
+        draw.text((width / 2, y + height * 0.05), FOOTER_TEXT, fill=tuple(theme["font_color"]),
+                  font=subtitle_font, anchor="ma")
+    else:
+        section_title, body_lines = payload
+        title_font = _font(height // 16, bold=True, fonts=fonts)
+        y = height * 0.06
+        for line in _wrap(draw, _clean(section_title), title_font, width - 2 * margin):
+            draw.text((margin, y), line, fill=tuple(theme["accent_color"]), font=title_font)
+            y += int(title_font.size * 1.2)
+        body_top = y + height * 0.04
+        body_bottom = height * 6.6 / 7.5
+
+        # Shrink the body text until it fits above the footer
+        body_size = height // 24
+        while True:
+            body_font = _font(body_size, fonts=fonts)
+            bullet_indent = int(draw.textlength("•  ", font=body_font))
+            wrapped = [_wrap(draw, _clean(line), body_font, width - 2 * margin - bullet_indent) for line in body_lines]
+            line_height = int(body_size * 1.35)
+            needed = sum(len(w) for w in wrapped) * line_height + len(wrapped) * body_size * 0.3
+            if body_top + needed <= body_bottom or body_size <= 12:
+                break
+            body_size -= 2
+
+        y = body_top
+        for lines in wrapped:
+            draw.text((margin, y), "•", fill=tuple(theme["font_color"]), font=body_font)
+            for line in lines:
+                draw.text((margin + bullet_indent, y), line, fill=tuple(theme["font_color"]), font=body_font)
+                y += line_height
+            y += body_size * 0.3
+
+    _draw_footer(draw, theme, width, height, fonts)
+    image.save(path, "PNG", compress_level=1)
+    return path
+
+def _render_job(args):
+    return render_slide(*args)
+
+def render_slides_from_markdown(md_content, theme_choice="1", output_folder=".", size=VIDEO_SIZE, workers=None,
+                                on_frame=None, manifest=None, language=None, check_cancelled=None):
+    """
+    Render the same deck as slides.generate_slides_from_markdown (title slide + one
+    slide per `## ` section) straight to PNG frames, across a process pool for larger decks.
+    Fonts are picked for the deck's language and text; raises MissingGlyphs (before
+    drawing anything) when no installed font can draw it. `check_cancelled()` is called
+    between frames and raises to stop; frames not yet started are then dropped.
+    `on_frame(idx, path)` is called as each frame is written (in completion order), and
+    each frame is recorded in `manifest` (a LectureManifest) under section id idx + 1.
+    Returns the frame paths in slide order.
+    """
+    output_folder = output_folder or "."
+    os.makedirs(output_folder, exist_ok=True)
+
+    title, sections = parse_slide_markdown(md_content)
+    slides = [("title", title)] + [("content", section) for section in sections]
+    titles = [title] + [section_title for section_title, _ in sections]
+    fonts = select_fonts("\n".join([FOOTER_TEXT, "•"] + titles + [line for _, body in sections for line in body]),
+                         language)
+    jobs = [
+        (slide, theme_choice, os.path.join(output_folder, f"slide_{idx+1}.png"), size, fonts)
+        for idx, slide in enumerate(slides)
+    ]
+
+    def frame_done(idx, path):
+        if manifest is not None:
+            manifest.set_frame(idx + 1, path, title=titles[idx])
+        if on_frame is not None:
+            on_frame(idx, path)
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    # The manifest is written once when the deck is done, not once per frame
+    with manifest.batch() if manifest is not None else nullcontext():
+        if workers > 1 and len(jobs) >= PARALLEL_RENDER_MIN_SLIDES:
+            paths = [None] * len(jobs)
+            # Spawned, not forked: this runs on pipeline threads of a multi-threaded process
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+                futures = {pool.submit(_render_job, job): idx for idx, job in enumerate(jobs)}
+                try:
+                    for future in as_completed(futures):
+                        idx = futures[future]
+                        paths[idx] = future.result()
+                        frame_done(idx, paths[idx])
+                        if check_cancelled is not None:
+                            check_cancelled()
+                except BaseException:
+                    pool.shutdown(cancel_futures=True)
+                    raise
+        else:
+            paths = []
+            for idx, job in enumerate(jobs):
+                if check_cancelled is not None:
+                    check_cancelled()
+                paths.append(_render_job(job))
+                frame_done(idx, paths[idx])
+    print(f"✅ Rendered {len(paths)} slide frames at {size[0]}x{size[1]}")
+    return paths
@@ -1,7 +1,29 @@
-from google.generativeai import GenerativeModel
+from concurrent.futures import ThreadPoolExecutor
+import re
+from cache import LRUCache, cache_key
+from llm import generate_text
+from slides import split_slide_markdown
 
+MAX_PARALLEL_SECTIONS = 6  # concurrent section narrations / translations
 
+# Translated sections keyed by (section text hash, language); unchanged sections are never re-translated
+_translation_cache = LRUCache(max_entries=2048, max_weight=20_000_000)
 
+def split_sections(md_content):
+    """
+    Split a narration script into [(title, body)] at each `## ` header, in order.
+    Slide markdown is split with slides.split_slide_markdown instead.
+    """
+    sections = []
+    for part in re.split(r'^## ', md_content, flags=re.M)[1:]:
+        lines = part.split('\n', 1)
+        title = lines[0].strip()
+        body = lines[1].strip() if len(lines) > 1 else ""
+        sections.append((title, body))
+    return sections
+
+def join_sections(sections):
+    return "\n\n".join(f"## {title}\n\n{body}".strip() for title, body in sections) + "\n"
 
 def translate_text(text, target_language="Hindi"):
     prompt = f"""
@@ -14,11 +36,27 @@ TEXT:
 {text}
 \"\"\"
 """
-    model = GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-    return response.text
-
-def generate_slide_content(topic, length="Detailed", context="", language="English"):
+    return generate_text(prompt)
+
+def _is_english(language):
+    return language.strip().lower() == "english"
+
+def translate_section(title, body, target_language):
+    """Translate one `## ` section, served from the translation cache when unchanged."""
+    section = f"## {title}\n\n{body}".strip()
+    key = cache_key(section, target_language.strip().lower())
+    return _translation_cache.get_or_compute(key, lambda: translate_text(section, target_language).strip())
+
+def translate_script(script, target_language="Hindi", max_workers=MAX_PARALLEL_SECTIONS):
+    """Translate a sectioned script per section, in parallel, through the translation cache."""
+    sections = split_sections(script)
+    if not sections:
+        return translate_text(script, target_language)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        translated = list(pool.map(lambda sec: translate_section(sec[0], sec[1], target_language), sections))
+    return "\n\n".join(translated) + "\n"
+
+def generate_slide_content(topic, length="Detailed", context="", language="English", on_progress=None):
     prompt = f"""
 You are an expert educator tasked with creating clear, structured slide content for a lecture on '{topic}'.
 Use the context below to improve factual accuracy and relevance:
@@ -56,13 +94,11 @@ Use the following Markdown structure:
 Keep it factual, beginner-friendly, and slide-ready.
 Length: {length}.
 """
-    model = GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-    return response.text
+    return generate_text(prompt, on_progress=on_progress)
 
-def generate_professor_script(topic, md_content, persona="enthusiastic professor", context="", language="English"):
+def _generate_full_script(topic, md_content, persona, context, language="English", check_cancelled=None):
     prompt = f"""
-You are an {persona} giving a lecture on '{topic}' to college students in English.
+You are an {persona} giving a lecture on '{topic}' to college students in {language}.
 
 Use the slide content and context provided below to generate a personal, spoken script.
 Add light jokes, questions, transitions, and make it sound like a real teacher.
@@ -79,25 +115,91 @@ CONTEXT (if helpful):
 
 Return a narration with the same section headers so each section aligns with a slide.
 Use the same ## section formatting for each.
+Write the whole narration directly in {language}; keep the ## section headers exactly as in the slide content.
 """
-    model = GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-    english_script = response.text
+    return generate_text(prompt, check_cancelled=check_cancelled)
 
-    # Add ## Title manually if not present
-    if "## Title" not in english_script:
-        english_script = f"## Title: {topic}\n\n" + english_script.strip()
+def _generate_section_narration(topic, persona, context, outline, sections, idx, language="English",
+                                check_cancelled=None):
+    title, body = sections[idx]
+    previous_title = sections[idx - 1][0] if idx > 0 else None
+    next_title = sections[idx + 1][0] if idx + 1 < len(sections) else None
+    prompt = f"""
+You are an {persona} giving a lecture on '{topic}' to college students in {language}.
+
+LECTURE OUTLINE (for coherence only):
+{outline}
 
-    if language.strip().lower() != "english":
-        translated_script = translate_text(english_script, target_language=language)
-        return translated_script
+You are narrating section {idx + 1} of {len(sections)}: '{title}'.
+Previous section: {previous_title or "none, this opens the lecture"}.
+Next section: {next_title or "none, this closes the lecture"}.
+
+Turn the slide content below into a personal, spoken script for this section only.
+Add light jokes, questions and transitions, and make it sound like a real teacher.
+Bridge naturally from the previous section and lead into the next one.
+
+SLIDE CONTENT:
+\"\"\"
+{body}
+\"\"\"
+
+CONTEXT (if helpful):
+\"\"\"
+{context}
+\"\"\"
+
+Return only the narration text, written directly in {language}. Do not include a section header.
+"""
+    narration = generate_text(prompt, check_cancelled=check_cancelled).strip()
+    # Drop a header if the model added one anyway
+    return re.sub(r'^#+ .*\n+', '', narration, count=1) if narration.startswith("#") else narration
+
+def generate_professor_script_parallel(topic, md_content, persona="enthusiastic professor", context="",
+                                       max_workers=MAX_PARALLEL_SECTIONS, language="English", check_cancelled=None):
+    """
+    Narrate every slide (the title slide included) concurrently with a shared deck
+    outline, then stitch the results into one `## ` section per slide, in slide order.
+    """
+    sections = split_slide_markdown(md_content)
+    outline = "\n".join(f"{i + 1}. {title}" for i, (title, _) in enumerate(sections))
+    print(f"Generating narration for {len(sections)} slides in parallel...")
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        narrations = list(pool.map(
+            lambda idx: _generate_section_narration(topic, persona, context, outline, sections, idx, language,
+                                                    check_cancelled),
+            range(len(sections)),
+        ))
+    headers = [f"Title: {sections[0][0]}"] + [title for title, _ in sections[1:]]
+    return join_sections(list(zip(headers, narrations)))
+
+def generate_professor_script(topic, md_content, persona="enthusiastic professor", context="", language="English",
+                              parallel=False, max_workers=MAX_PARALLEL_SECTIONS, translation_mode="native",
+                              check_cancelled=None):
+    """
+    translation_mode="native" writes the script directly in `language` (one pass);
+    "translate" writes it in English and translates it section by section through the cache.
+    `check_cancelled()` is polled around the model calls and raises to stop them.
+    """
+    native = translation_mode == "native" or _is_english(language)
+    script_language = language if native else "English"
+    if parallel and len(split_slide_markdown(md_content)) > 1:
+        script = generate_professor_script_parallel(topic, md_content, persona, context, max_workers, script_language,
+                                                    check_cancelled)
     else:
-        return english_script
+        script = _generate_full_script(topic, md_content, persona, context, script_language, check_cancelled)
+
+    # Add ## Title manually if not present
+    if "## Title" not in script:
+        script = f"## Title: {topic}\n\n" + script.strip()
+
+    if not native:
+        return translate_script(script, target_language=language, max_workers=max_workers)
+    return script
     
 
 
 
-def generate_notes_gemini(topic, length, context="", language="English"):
+def generate_notes_gemini(topic, length, context="", language="English", on_progress=None):
     prompt = f"""
     You are an academic assistant. Generate well-structured study notes in markdown.
     Topic: {topic}
@@ -112,6 +214,4 @@ def generate_notes_gemini(topic, length, context="", language="English"):
     - Keep language simple but academic
     - Ensure logical flow
     """
-    model = GenerativeModel("gemini-2.0-flash")
-    response = model.generate_content(prompt)
-    return response.text
+    return generate_text(prompt, on_progress=on_progress)
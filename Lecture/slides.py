@@ -29,7 +29,64 @@ def add_footer(slide, text, font_color):
     p.font.size = Pt(12)
     p.font.color.rgb = font_color
 
-def generate_slides_from_markdown(md_file, theme_choice="1"):
+_WRAPPING_FENCE = re.compile(r'^```[\w-]*\s*$')
+_TITLE_PREFIX = re.compile(r'^Title\s*:\s*')
+
+def split_slide_markdown(content):
+    """
+    The one splitter for slide markdown, shared by the .pptx, the rendered frames and the
+    narration, so narration section i always belongs to slide i. Returns [(title, body)]
+    with one entry per slide: the title slide first, then one per `## ` section.
+    A fence wrapping the whole deck (```markdown ... ```) is dropped; the title comes
+    from a `## Title:` section or the first `# ` heading, and any text before the first
+    section stays with the title slide.
+    """
+    lines = content.replace("\r\n", "\n").strip().split("\n")
+    if lines and _WRAPPING_FENCE.match(lines[0].strip()):
+        lines = lines[1:]
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]
+
+    parts = re.split(r'^## ', "\n".join(lines), flags=re.M)
+    preamble, sections = parts[0], []
+    for part in parts[1:]:
+        section_lines = part.split("\n", 1)
+        sections.append((section_lines[0].strip(), section_lines[1].strip() if len(section_lines) > 1 else ""))
+
+    title = None
+    if sections and _TITLE_PREFIX.match(sections[0][0]):
+        section_title, body = sections.pop(0)
+        title = _TITLE_PREFIX.sub("", section_title).strip()
+        preamble += "\n" + body
+    preamble_lines = []
+    for line in preamble.split("\n"):
+        if line.startswith("# "):
+            title = title or _TITLE_PREFIX.sub("", line[2:].strip()).strip()
+        else:
+            preamble_lines.append(line)
+    return [(title or "Lecture", "\n".join(preamble_lines).strip())] + sections
+
+def parse_slide_markdown(content):
+    """
+    Parse lecture markdown into (title, [(section_title, body_lines)]), one entry per
+    slide after the title slide. Bullet markers are stripped and blank lines dropped.
+    """
+    slides = split_slide_markdown(content)
+    sections = []
+    for section_title, body in slides[1:]:
+        body_lines = []
+        for line in body.split('\n'):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith('-'):
+                line = line[1:].strip()
+            body_lines.append(line)
+        sections.append((section_title, body_lines))
+    return slides[0][0], sections
+
+def generate_slides_from_markdown(md_file, theme_choice="1", output_file=None):
+    """Build the .pptx for a slide markdown file. Saved next to md_file unless output_file is given."""
     theme = THEMES.get(theme_choice, THEMES["1"])
     prs = Presentation()
     bullet_slide_layout = prs.slide_layouts[1]
@@ -37,9 +94,7 @@ def generate_slides_from_markdown(md_file, theme_choice="1"):
     with open(md_file, 'r', encoding='utf-8') as f:
         content = f.read()
 
-    sections = re.split(r'\n## ', content)
-    title_match = re.search(r'# Title: (.+)', sections[0])
-    title = title_match.group(1).strip() if title_match else "Lecture"
+    title, sections = parse_slide_markdown(content)
 
     # Title slide
     title_slide = prs.slides.add_slide(prs.slide_layouts[0])
@@ -50,14 +105,7 @@ def generate_slides_from_markdown(md_file, theme_choice="1"):
     subtitle.text_frame.paragraphs[0].font.color.rgb = theme["font_color"]
     add_footer(title_slide, "Generated by collegeAi", theme["font_color"])
 
-    for sec in sections[1:]:
-        lines = sec.strip().split('\n')
-        if not lines:
-            continue
-
-        section_title = lines[0].strip()
-        content_lines = lines[1:]
-
+    for section_title, content_lines in sections:
         slide = prs.slides.add_slide(bullet_slide_layout)
         apply_background(slide, theme["bg_color"])
         shapes = slide.shapes
@@ -71,31 +119,23 @@ def generate_slides_from_markdown(md_file, theme_choice="1"):
         tf.clear()
 
         for line in content_lines:
-            line = line.strip()
-            if not line:
-                continue
-            if line.startswith('-'):
-                p = tf.add_paragraph()
-                p.text = line[1:].strip()
-                p.level = 0
-            else:
-                p = tf.add_paragraph()
-                p.text = line
-                p.level = 0
+            p = tf.add_paragraph()
+            p.text = line
+            p.level = 0
             p.font.size = Pt(20)
             p.font.color.rgb = theme["font_color"]
 
         add_footer(slide, "Generated by collegeAi", theme["font_color"])
 
-    output_file = md_file.replace('Lecture', 'Slides').replace('.md', '.pptx')
-
-    base_dir = os.path.dirname(md_file)
-    base_name = os.path.basename(md_file).replace('Lecture', 'Slides').replace('.md', '.pptx')
-    output_file = os.path.join(base_dir, base_name)
+    if output_file is None:
+        base_dir = os.path.dirname(md_file)
+        base_name = os.path.basename(md_file).replace('Lecture', 'Slides').replace('.md', '.pptx')
+        output_file = os.path.join(base_dir, base_name)
 
     prs.save(output_file)
 
     print(f"✅ Slides saved as {output_file}")
+    return output_file
 
 if __name__ == "__main__":
     md_file = input("Enter the path to the lecture markdown file: ").strip()
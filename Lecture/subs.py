@@ -1,7 +1,8 @@
-import re
 import wave
 import os
 from datetime import timedelta
+from manifest import LectureManifest
+from slides import split_slide_markdown
 
 def get_wav_duration(file_path):
     with wave.open(file_path, 'rb') as wf:
@@ -11,40 +12,73 @@ def get_wav_duration(file_path):
     return duration
 
 def format_timestamp(seconds):
-    td = timedelta(seconds=seconds)
-    return str(td)[:-3].replace(".", ",").rjust(12, '0')
+    # HH:MM:SS,mmm (str(timedelta) drops the fraction for whole seconds, so format explicitly)
+    millis = int(round(timedelta(seconds=seconds).total_seconds() * 1000))
+    hours, millis = divmod(millis, 3_600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{millis:03d}"
 
-def generate_subtitles(md_file, output_srt="subtitles.srt"):
+def generate_subtitles_from_sections(sections, output_srt="subtitles.srt"):
+    """
+    Write an SRT from in-memory audio sections ({"text", "duration"}) as returned by
+    TTS.synthesize_script_audio. No WAV is re-opened. Silent sections (no text) get no
+    cue but still advance the clock.
+    """
+    subtitles = []
+    current_time = 0.0
+    index = 0
+    for section in sections:
+        start = format_timestamp(current_time)
+        end = format_timestamp(current_time + section["duration"])
+        current_time += section["duration"]
+        if not section["text"].strip():
+            continue
+        index += 1
+
+        subtitles.append(f"{index}")
+        subtitles.append(f"{start} --> {end}")
+        subtitles.append(section["text"].strip())
+        subtitles.append("")  # blank line
+
+    with open(output_srt, 'w', encoding='utf-8') as f:
+        f.write("\n".join(subtitles))
+
+    print(f"✅ Subtitles generated and saved as {output_srt}")
+    return output_srt
+
+def generate_subtitles(md_file, output_srt="subtitles.srt", audio_folder="."):
+    """
+    Subtitles for a narration file. Durations come from the manifest in audio_folder
+    (no WAV is opened); sections it does not record fall back to audio_folder/slide_N.wav.
+    """
     with open(md_file, 'r', encoding='utf-8') as f:
         content = f.read()
+    manifest = LectureManifest.open(audio_folder)
 
-    # Split sections based on markdown headers
-    sections = re.split(r'\n## ', content)
+    # One section per slide, split exactly as the narration was for TTS
+    sections = split_slide_markdown(content)
     subtitles = []
 
     current_time = 0.0
     index = 1
 
-    for i, sec in enumerate(sections):
-        lines = sec.strip().split('\n')
-        if not lines:
-            continue
-
-        if i == 0:
-            # First section might contain "# Title"
-            section_text = "\n".join(lines[1:]).strip()
+    for i, (_, section_text) in enumerate(sections):
+        entry = manifest.get(i + 1)
+        if entry and entry["duration"] is not None:
+            duration = entry["duration"]
         else:
-            section_text = "\n".join(lines[1:]).strip()
+            audio_file = os.path.join(audio_folder, f"slide_{i+1}.wav")
+            if not os.path.exists(audio_file):
+                print(f"❌ Missing audio file: {audio_file}, skipping...")
+                continue
+            duration = get_wav_duration(audio_file)
 
-        audio_file = f"slide_{i+1}.wav"
-        if not os.path.exists(audio_file):
-            print(f"❌ Missing audio file: {audio_file}, skipping...")
-            continue
-
-        duration = get_wav_duration(audio_file)
         start = format_timestamp(current_time)
         end = format_timestamp(current_time + duration)
         current_time += duration
+        if not section_text.strip():
+            continue
 
         subtitles.append(f"{index}")
         subtitles.append(f"{start} --> {end}")
@@ -60,4 +94,5 @@ def generate_subtitles(md_file, output_srt="subtitles.srt"):
 if __name__ == "__main__":
     print("=== Subtitle Generator ===")
     md_file = input("Enter the path to your professor narration .md file: ").strip()
-    generate_subtitles(md_file)
+    folder = os.path.dirname(md_file) or "."
+    generate_subtitles(md_file, output_srt=os.path.join(folder, "subtitles.srt"), audio_folder=folder)
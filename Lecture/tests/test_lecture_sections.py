@@ -0,0 +1,98 @@
+"""
+Slides and narration must pair up by slide id, whatever shape the model's markdown
+takes: a deck wrapped in a ```markdown fence or opening with a `# Title:` H1 used to
+yield one more frame than narration sections and fail the video stage.
+"""
+import pytest
+
+pytest.importorskip("google.generativeai")
+pytest.importorskip("google.genai")
+
+import advance
+import pipeline
+import TTS
+from advance import HLSWriter
+from cache import DiskCache
+from jobs import Job
+from manifest import LectureManifest
+from workspace import Workspace
+
+FENCED_DECK = """```markdown
+## Title: Photosynthesis
+
+## Light Reactions
+- Chlorophyll absorbs light
+- Water is split
+
+## Calvin Cycle
+- CO2 is fixed into sugar
+```"""
+
+H1_DECK = """# Title: Photosynthesis
+
+## Light Reactions
+- Chlorophyll absorbs light
+- Water is split
+
+## Calvin Cycle
+- CO2 is fixed into sugar
+"""
+
+# The narration says nothing for the title slide
+SCRIPT = """## Light Reactions
+Light hits the leaf and water is split.
+
+## Calvin Cycle
+The plant turns carbon dioxide into sugar.
+"""
+
+
+@pytest.fixture
+def lecture(tmp_path, monkeypatch):
+    """Run the lecture graph for a deck with the model calls replaced; returns (results, manifest)."""
+    monkeypatch.setattr(pipeline, "CHECKPOINT_ROOT", str(tmp_path / "checkpoints"))
+    monkeypatch.setattr(TTS, "_audio_cache", DiskCache(str(tmp_path / "tts"), suffix=".pcm"))
+    monkeypatch.setattr(advance, "_segment_cache", DiskCache(str(tmp_path / "segments"), suffix=".mp4"))
+    monkeypatch.setattr(pipeline, "generate_professor_script", lambda *args, **kwargs: SCRIPT)
+    monkeypatch.setattr(TTS, "synthesize_speech",
+                        lambda text, voice_name="Kore", check_cancelled=None: b"\1\0" * TTS.SAMPLE_RATE)
+
+    def run(deck):
+        monkeypatch.setattr(pipeline, "generate_slide_content", lambda *args, **kwargs: deck)
+        job = Job("lecture", pipeline.LECTURE_STAGES)
+        workspace = Workspace(root=str(tmp_path / "jobs"), job_id=job.id, gc=False)
+        preview = HLSWriter(str(tmp_path / "hls" / job.id))
+        manifest = LectureManifest(workspace.file("manifest.json"), sample_rate=TTS.SAMPLE_RATE)
+        graph = pipeline.lecture_graph("Photosynthesis", "Short", "", "English", "teacher", "Kore", "1",
+                                       preview, manifest)
+        try:
+            results = pipeline.run_graph(job, graph, workspace=workspace)
+        finally:
+            preview.close()
+        return results, manifest
+
+    return run
+
+
+@pytest.mark.parametrize("deck", [FENCED_DECK, H1_DECK], ids=["fenced", "h1"])
+def test_every_slide_gets_its_narration(lecture, deck):
+    results, manifest = lecture(deck)
+
+    sections = manifest.sections()
+    assert [section["id"] for section in sections] == [1, 2, 3]
+    assert all(section["frame"] and section["audio"] for section in sections)
+
+    audio = results["audio"]["sections"]
+    assert [section["title"] for section in audio] == ["Photosynthesis", "Light Reactions", "Calvin Cycle"]
+    # The title slide has no narration, so it is held silently instead of failing
+    assert audio[0]["text"] == ""
+    assert audio[0]["duration"] == pytest.approx(TTS.SILENT_SLIDE_SECONDS)
+    assert audio[1]["text"].startswith("Light hits the leaf")
+    assert audio[2]["text"].startswith("The plant turns")
+
+    assert len(results["frames"]["paths"]) == 3
+    assert results["video"]["path"].endswith(".mp4")
+    with open(results["subtitles"]["path"], encoding="utf-8") as f:
+        srt = f.read()
+    # No cue for the silent title slide, but the first cue starts after it
+    assert srt.startswith("1\n00:00:03,000 --> ")
@@ -1,88 +1,100 @@
 import os
 import subprocess
-from pdf2image import convert_from_path
-from moviepy import ImageClip, concatenate_videoclips, AudioFileClip
-from pydub.utils import mediainfo
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import fitz  # PyMuPDF
+from PIL import Image
+from office import CONVERT_TIMEOUT, OfficeNotFound, get_office_pool
+from manifest import LectureManifest
+from render import VIDEO_SIZE
 
-def convert_pptx_to_pdf(pptx_file):
+PARALLEL_RASTER_MIN_PAGES = 8
+
+def convert_pptx_to_pdf(pptx_file, timeout=CONVERT_TIMEOUT, pdf_file=None):
     """
-    Convert PPTX to PDF using LibreOffice on macOS
+    Convert PPTX to PDF through the shared pool of headless LibreOffice workers
+    (no per-deck soffice start-up). The PDF goes next to the PPTX unless pdf_file is given.
     """
     if not os.path.exists(pptx_file):
         print(f"Error: File {pptx_file} does not exist")
         return None
     
-    pdf_file = pptx_file.replace('.pptx', '.pdf')
-    output_dir = os.path.dirname(os.path.abspath(pptx_file))
-    
-    # Check if LibreOffice is installed
-    libreoffice_path = '/Applications/LibreOffice.app/Contents/MacOS/soffice'
-    if not os.path.exists(libreoffice_path):
-        print("LibreOffice not found. Install with: brew install --cask libreoffice")
-        return None
-    
+    pdf_file = pdf_file or os.path.splitext(pptx_file)[0] + ".pdf"
+
     try:
         print(f"Converting {pptx_file} to PDF...")
-        cmd = [
-            libreoffice_path,
-            '--headless',
-            '--convert-to', 'pdf',
-            '--outdir', output_dir,
-            pptx_file
-        ]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-        
-        if result.returncode == 0:
-            print(f"Successfully converted to: {pdf_file}")
-            return pdf_file
-        else:
-            print(f"Conversion failed: {result.stderr}")
-            # Try alternative LibreOffice paths
-            alternative_paths = [
-                '/usr/bin/libreoffice',
-                '/usr/local/bin/libreoffice',
-                'libreoffice'  # If in PATH
-            ]
-            
-            for alt_path in alternative_paths:
-                try:
-                    cmd[0] = alt_path
-                    result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
-                    if result.returncode == 0:
-                        print(f"Successfully converted using {alt_path}")
-                        return pdf_file
-                except FileNotFoundError:
-                    continue
-            
-            print("Could not find working LibreOffice installation")
-            return None
-            
+        get_office_pool().convert(pptx_file, pdf_file, timeout=timeout)
+        print(f"Successfully converted to: {pdf_file}")
+        return pdf_file
+    except OfficeNotFound as e:
+        print(e)
+        return None
     except subprocess.TimeoutExpired:
         print("Conversion timed out")
         return None
-    except FileNotFoundError:
-        print("LibreOffice not found. Please install with: brew install --cask libreoffice")
-        return None
     except Exception as e:
         print(f"Error during conversion: {e}")
         return None
 
 
-def convert_pdf_to_images(pdf_file, output_folder):
+def _rasterize_page(page, path, size, image_format):
+    # Render straight at the target resolution (aspect kept, letterboxed), one frame in memory
+    zoom = min(size[0] / page.rect.width, size[1] / page.rect.height)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    frame = Image.new("RGB", size, (0, 0, 0))
+    frame.paste(Image.frombytes("RGB", (pix.width, pix.height), pix.samples),
+                ((size[0] - pix.width) // 2, (size[1] - pix.height) // 2))
+    if image_format == "jpg":
+        frame.save(path, "JPEG", quality=90)
+    else:
+        frame.save(path, "PNG", compress_level=1)
+    return path
+
+def _rasterize_range(pdf_file, output_folder, start, stop, size, image_format):
+    with fitz.open(pdf_file) as doc:
+        return [
+            _rasterize_page(doc[idx], os.path.join(output_folder, f"slide_{idx+1}.{image_format}"), size, image_format)
+            for idx in range(start, stop)
+        ]
+
+def iter_pdf_images(pdf_file, output_folder, size=VIDEO_SIZE, image_format="png"):
+    """Rasterize pages one at a time, yielding each frame path as soon as it is written."""
+    output_folder = output_folder or "."
+    os.makedirs(output_folder, exist_ok=True)
+    with fitz.open(pdf_file) as doc:
+        for idx, page in enumerate(doc):
+            yield _rasterize_page(page, os.path.join(output_folder, f"slide_{idx+1}.{image_format}"), size, image_format)
+
+def convert_pdf_to_images(pdf_file, output_folder, size=VIDEO_SIZE, image_format="png", workers=None, manifest=None):
+    """
+    Rasterize every page at the video resolution. Larger decks split contiguous page
+    ranges across processes; peak memory stays at about one frame per worker.
+    Page N is recorded in `manifest` (a LectureManifest) as section id N.
+    """
     output_folder = output_folder or "."  # ✅ Default to current dir if empty
 
     if not os.path.exists(output_folder):
         os.makedirs(output_folder)
 
-    images = convert_from_path(pdf_file, dpi=200)
-    image_paths = []
-    for idx, image in enumerate(images):
-        path = os.path.join(output_folder, f"slide_{idx+1}.png")
-        image.save(path, "PNG")
-        image_paths.append(path)
-
-    return image_paths
+    with fitz.open(pdf_file) as doc:
+        page_count = doc.page_count
+    workers = min(workers or os.cpu_count() or 1, page_count)
+    if workers <= 1 or page_count < PARALLEL_RASTER_MIN_PAGES:
+        paths = list(iter_pdf_images(pdf_file, output_folder, size, image_format))
+    else:
+        step = -(-page_count // workers)
+        # Spawned, not forked (the caller may be multi-threaded); workers open the PDF by path
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = [
+                pool.submit(_rasterize_range, pdf_file, output_folder, start, min(start + step, page_count), size, image_format)
+                for start in range(0, page_count, step)
+            ]
+            paths = [path for future in futures for path in future.result()]
+    if manifest is not None:
+        with manifest.batch():
+            for idx, path in enumerate(paths):
+                manifest.set_frame(idx + 1, path)
+    return paths
 
 
 def main():
@@ -98,7 +110,8 @@ def main():
 
     print("Converting PDF to slide images...")
     output_folder = os.path.dirname(pptx_file) or "."
-    slide_images = convert_pdf_to_images(pdf_file, output_folder=output_folder)
+    slide_images = convert_pdf_to_images(pdf_file, output_folder=output_folder,
+                                         manifest=LectureManifest.open(output_folder))
 
     output_file = pptx_file.replace('.pptx', '.mp4')
 
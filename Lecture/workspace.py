@@ -0,0 +1,111 @@
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+import uuid
+from cache import CACHE_DIR
+
+# ---- JOB WORKSPACES: one private directory per generation run, removed after a TTL ----
+WORKSPACE_ROOT = os.environ.get("COLLEGEAI_WORKSPACE_DIR", os.path.join(CACHE_DIR, "jobs"))
+WORKSPACE_TTL = int(os.environ.get("COLLEGEAI_WORKSPACE_TTL", 24 * 3600))  # seconds since last use
+GC_INTERVAL = 600  # at most one garbage-collection sweep per root every 10 minutes
+
+_ALIVE_MARKER = ".alive"
+_UNDERSCORE_RUNS = re.compile(r"_{2,}")
+_gc_lock = threading.Lock()
+_last_gc = {}
+
+def sanitize_filename(name, default="lecture", max_length=80):
+    """
+    Turn user input (e.g. a topic) into a safe single path component: no separators,
+    no leading dots, no control or shell-special characters, bounded length.
+    Letters from any script are kept.
+    """
+    name = unicodedata.normalize("NFKC", str(name or ""))
+    # Combining marks are kept too (vowel signs in Indic scripts are not \w)
+    name = "".join(c if c.isalnum() or c in "._-" or unicodedata.category(c).startswith("M") else "_" for c in name)
+    name = _UNDERSCORE_RUNS.sub("_", name).strip("._")
+    return name[:max_length].rstrip("._") or default
+
+class Workspace:
+    """
+    Isolated directory for one job. Every file a run produces is created through
+    `file()` / `dir()`, so concurrent runs never share paths. Workspaces untouched for
+    longer than `ttl` are removed by `collect_garbage`, which runs automatically when
+    new workspaces are created.
+    """
+
+    def __init__(self, root=WORKSPACE_ROOT, job_id=None, ttl=WORKSPACE_TTL, gc=True):
+        self.root = root
+        self.ttl = ttl
+        self.job_id = sanitize_filename(job_id) if job_id else uuid.uuid4().hex
+        self.path = os.path.join(root, self.job_id)
+        if gc:
+            maybe_collect_garbage(root, ttl)
+        os.makedirs(self.path, exist_ok=True)
+        self.touch()
+
+    def file(self, *parts):
+        """Path of a file inside the workspace; every component is sanitized."""
+        path = os.path.join(self.path, *[sanitize_filename(part, default="file") for part in parts])
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def dir(self, *parts):
+        path = os.path.join(self.path, *[sanitize_filename(part, default="dir") for part in parts])
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def sub(self, *parts):
+        """Nested workspace in a sub-folder; it is removed together with this one."""
+        return Workspace(root=self.dir(*parts[:-1]) if parts[:-1] else self.path, job_id=parts[-1],
+                         ttl=self.ttl, gc=False)
+
+    def touch(self):
+        """Mark the workspace as in use, postponing its expiry by another `ttl`."""
+        with open(os.path.join(self.path, _ALIVE_MARKER), "a"):
+            pass
+        os.utime(os.path.join(self.path, _ALIVE_MARKER))
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+
+def _last_used(path):
+    try:
+        return os.path.getmtime(os.path.join(path, _ALIVE_MARKER))
+    except OSError:
+        return os.path.getmtime(path)
+
+def collect_garbage(root=WORKSPACE_ROOT, ttl=WORKSPACE_TTL):
+    """Remove workspaces under `root` not used for `ttl` seconds. Returns how many were removed."""
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - ttl
+    removed = 0
+    for entry in os.scandir(root):
+        try:
+            if entry.is_dir(follow_symlinks=False) and _last_used(entry.path) < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue  # removed concurrently by another process
+    if removed:
+        print(f"🧹 Removed {removed} expired workspace(s) from {root}")
+    return removed
+
+def maybe_collect_garbage(root=WORKSPACE_ROOT, ttl=WORKSPACE_TTL):
+    """Run `collect_garbage` for `root` unless it already ran within GC_INTERVAL."""
+    with _gc_lock:
+        now = time.monotonic()
+        if now - _last_gc.get(root, float("-inf")) < GC_INTERVAL:
+            return 0
+        _last_gc[root] = now
+    return collect_garbage(root, ttl)